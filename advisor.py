@@ -0,0 +1,155 @@
+"""Monte Carlo bid advice for a round shape.
+
+Many random deals of the round's cards are played out at once on numpy
+arrays, one row per deal, with a simple greedy policy:
+- The leader plays their best non-trump card.
+- Everyone else wins the trick as cheaply as they can, or throws their
+  cheapest card.
+The deals are split across a process pool. Only the round's shape is known
+(cards in hand, trumps, seat), not anyone's actual hand, so the result is
+each seat's trick distribution for that shape. From it, each bid's
+expected score under the 10 + tricks rule follows.
+
+A simulation covers every seat, so results are cached per (cards, trump)
+in memory and on disk. After the first run any seat is instant.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from disk_cache import DiskCache, content_key
+from engine import SUITS, cards_in_round, trump_for_round
+
+DEALS = int(os.environ.get("WHIST_ADVISOR_DEALS", 40000))
+WORKERS = min(4, os.cpu_count() or 1)
+SIM_VERSION = 1
+CACHE_DIR = os.environ.get("WHIST_ADVISOR_CACHE", os.path.join(".whist", "advisor"))
+CACHE_BYTES = 5 * 1024 * 1024
+NUM_SEATS = 4
+
+
+def simulate(cards, trump, deals, seed=None):
+    """Tricks won per seat, shape (deals, 4); seat 0 leads the first trick.
+
+    trump is a suit index 0-3, or None for No Trumps.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    rows = np.arange(deals)
+    hands = rng.random((deals, 52)).argsort(axis=1)[:, :NUM_SEATS * cards].reshape(deals, NUM_SEATS, cards)
+    suits, ranks = hands // 13, hands % 13
+    played = np.zeros(hands.shape, dtype=bool)
+    tricks = np.zeros((deals, NUM_SEATS), dtype=np.int64)
+    leader = np.zeros(deals, dtype=np.int64)
+    is_trump = suits == trump if trump is not None else np.zeros(hands.shape, dtype=bool)
+
+    for _ in range(cards):
+        led = best = winner = None
+        for position in range(NUM_SEATS):
+            seat = (leader + position) % NUM_SEATS
+            in_hand = ~played[rows, seat]
+            suit, rank, trumps = suits[rows, seat], ranks[rows, seat], is_trump[rows, seat]
+            if position == 0:
+                # Lead the best card, keeping trumps back while there's anything else
+                choice = np.where(in_hand, rank + 13 * ~trumps, -1).argmax(axis=1)
+                led = suit[rows, choice]
+                strength = 13 + rank + 26 * trumps
+                best, winner = strength[rows, choice], seat.copy()
+            else:
+                follow = in_hand & (suit == led[:, None])
+                allowed = np.where(follow.any(axis=1)[:, None], follow, in_hand)
+                # 0 can't win; following suit ranks above that and trumps above both
+                strength = np.where(trumps, 39 + rank, np.where(suit == led[:, None], 13 + rank, 0))
+                winning = allowed & (strength > best[:, None])
+                cheapest_win = np.where(winning, strength, 99).argmin(axis=1)
+                cheapest_discard = np.where(allowed, rank + 13 * trumps, 99).argmin(axis=1)
+                choice = np.where(winning.any(axis=1), cheapest_win, cheapest_discard)
+                card_strength = strength[rows, choice]
+                takes = card_strength > best
+                best = np.where(takes, card_strength, best)
+                winner = np.where(takes, seat, winner)
+            played[rows, seat, choice] = True
+        tricks[rows, winner] += 1
+        leader = winner
+    return tricks
+
+
+def _histogram(cards, trump, deals, seed):
+    import numpy as np
+
+    tricks = simulate(cards, trump, deals, seed)
+    return np.stack([np.bincount(tricks[:, s], minlength=cards + 1) for s in range(NUM_SEATS)]).tolist()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import multiprocessing
+
+            # spawn: forking a process with Streamlit's threads running isn't safe
+            _pool = ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def trick_counts(cards, trump, deals=DEALS, workers=WORKERS):
+    """Histogram of tricks won per seat, [seat][tricks], over `deals` simulated deals."""
+    import numpy as np
+
+    if workers <= 1:
+        return _histogram(cards, trump, deals, None)
+    seeds = np.random.SeedSequence().spawn(workers)
+    sizes = [deals // workers + (i < deals % workers) for i in range(workers)]
+    futures = [get_pool().submit(_histogram, cards, trump, n, seed) for n, seed in zip(sizes, seeds)]
+    return np.sum([f.result() for f in futures], axis=0).tolist()
+
+
+_memory = {}
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(CACHE_DIR, CACHE_BYTES, suffix=".json")
+    return _cache
+
+
+def trump_index(trump):
+    """Suit index for the simulator (None for No Trumps)."""
+    index = SUITS.index(trump)
+    return index if index < NUM_SEATS else None
+
+
+def distribution(cards, trump, seat):
+    """Probability of taking 0..cards tricks from a seat (0 = left of the dealer, 3 = dealer)."""
+    key = content_key("advisor", SIM_VERSION, DEALS, cards, trump)
+    counts = _memory.get(key)
+    if counts is None:
+        cached = get_cache().get(key)
+        if cached is not None:
+            counts = json.loads(cached)
+        else:
+            counts = trick_counts(cards, trump_index(trump))
+            get_cache().put(key, json.dumps(counts).encode("utf-8"))
+        _memory[key] = counts
+    total = sum(counts[seat])
+    return [n / total for n in counts[seat]]
+
+
+def expected_scores(probabilities, banned=None):
+    """Expected score of every legal bid: average tricks, plus 10 times the chance of hitting it."""
+    mean = sum(k * p for k, p in enumerate(probabilities))
+    return {bid: mean + 10 * p for bid, p in enumerate(probabilities) if bid != banned}
+
+
+def advice(round_num, seat, banned=None):
+    """(trick distribution, expected score per legal bid) for a seat in a round."""
+    probabilities = distribution(cards_in_round(round_num), trump_for_round(round_num), seat)
+    return probabilities, expected_scores(probabilities, banned)
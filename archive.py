@@ -0,0 +1,237 @@
+"""Local archive of finished games, one row per player per round.
+
+Rows are stored as Parquet. Each finished game is written to a small part
+file, and every COMPACT_AT parts are merged into one segment. As each game
+is added, the aggregates the History view shows are updated and kept in
+aggregates.json, so opening the view reads one small file:
+- hit rate per player
+- hit rate by cards in hand and trump suit
+- average score per round
+Anything else is a pyarrow query over the whole table, loaded once and
+reused until a game is added.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from engine import cards_in_round, dealer_index, rank, round_score, trump_for_round
+
+ARCHIVE_DIR = os.environ.get("WHIST_ARCHIVE_DIR", os.path.join(".whist", "archive"))
+COMPACT_AT = 32
+AGGREGATES_VERSION = 1
+
+SCHEMA = pa.schema([
+    ("game_id", pa.string()),
+    ("round", pa.int8()),
+    ("cards", pa.int8()),
+    ("trump", pa.dictionary(pa.int8(), pa.string())),
+    ("seat", pa.int8()),
+    ("player", pa.dictionary(pa.int8(), pa.string())),
+    ("dealer", pa.bool_()),
+    ("guess", pa.int8()),
+    ("tricks", pa.int8()),
+    ("score", pa.int16()),
+    ("hit", pa.bool_()),
+])
+
+
+def hand_key(cards, trump):
+    return f"{cards}|{trump}"
+
+
+def game_rows(log):
+    """Columns for one game's rows, in round then seat order."""
+    columns = {name: [] for name in SCHEMA.names}
+    players = log.player_order
+    for r, (guesses, tricks) in enumerate(log.rounds):
+        dealer = dealer_index(r, len(players))
+        for seat, (player, guess, won) in enumerate(zip(players, guesses, tricks)):
+            row = (log.game_id, r, cards_in_round(r), trump_for_round(r), seat, player,
+                   seat == dealer, guess, won, round_score(guess, won), guess == won)
+            for name, value in zip(SCHEMA.names, row):
+                columns[name].append(value)
+    return columns
+
+
+def empty_aggregates():
+    return {"version": AGGREGATES_VERSION, "games": 0, "game_ids": [], "players": {}, "hands": {}, "rounds": {}}
+
+
+def _count(bucket, key, **amounts):
+    entry = bucket.setdefault(key, dict.fromkeys(amounts, 0))
+    for name, amount in amounts.items():
+        entry[name] = entry.get(name, 0) + amount
+
+
+class Archive:
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._table = None
+        self._files = None
+        self._aggregates = None
+
+    # -- files --------------------------------------------------------------
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _list(self, prefix):
+        return sorted(f for f in os.listdir(self.directory) if f.startswith(prefix) and f.endswith(".parquet"))
+
+    def _write_table(self, table, name):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        os.close(fd)
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, self._path(name))
+
+    def _write_json(self, data, name):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self._path(name))
+
+    # -- writing ------------------------------------------------------------
+
+    def add(self, log):
+        """Archive a finished game; returns False if it isn't finished or is already here."""
+        if not log.game_over:
+            return False
+        with self._lock:
+            aggregates = self.aggregates()
+            if log.game_id in aggregates["game_ids"]:
+                return False
+            table = pa.table(game_rows(log), schema=SCHEMA)
+            digest = hashlib.sha1(log.game_id.encode("utf-8")).hexdigest()[:16]
+            self._write_table(table, f"part-{digest}.parquet")
+            self._add_to_aggregates(aggregates, log)
+            self._write_json(aggregates, "aggregates.json")
+            self._table = None
+            if len(self._list("part-")) >= COMPACT_AT:
+                self.compact()
+        return True
+
+    def compact(self):
+        """Merge part files into a new segment."""
+        with self._lock:
+            parts = self._list("part-")
+            if not parts:
+                return
+            merged = pa.concat_tables(pq.read_table(self._path(p), schema=SCHEMA) for p in parts)
+            self._write_table(merged, f"segment-{len(self._list('segment-')):05d}.parquet")
+            for p in parts:
+                os.remove(self._path(p))
+            self._table = None
+
+    # -- aggregates ---------------------------------------------------------
+
+    def _add_to_aggregates(self, aggregates, log):
+        aggregates["games"] += 1
+        aggregates["game_ids"].append(log.game_id)
+        winners = {player for position, player, _ in rank(log.totals) if position == 1}
+        for player in log.player_order:
+            _count(aggregates["players"], player, games=1, wins=int(player in winners), rounds=0, hits=0, score=0)
+        for r, (guesses, tricks) in enumerate(log.rounds):
+            hand = hand_key(cards_in_round(r), trump_for_round(r))
+            for player, guess, won in zip(log.player_order, guesses, tricks):
+                hit, score = int(guess == won), round_score(guess, won)
+                _count(aggregates["players"], player, rounds=1, hits=hit, score=score)
+                _count(aggregates["hands"], hand, rounds=1, hits=hit)
+                _count(aggregates["rounds"], str(r), rounds=1, score=score)
+
+    def aggregates(self):
+        with self._lock:
+            if self._aggregates is None:
+                try:
+                    with open(self._path("aggregates.json"), encoding="utf-8") as f:
+                        self._aggregates = json.load(f)
+                    if self._aggregates.get("version") != AGGREGATES_VERSION:
+                        raise ValueError("old aggregates")
+                except (FileNotFoundError, ValueError):
+                    self._aggregates = self.rebuild_aggregates()
+            return self._aggregates
+
+    def rebuild_aggregates(self):
+        """Recompute the aggregates from the stored rows (e.g. if aggregates.json is lost)."""
+        table = self.table()
+        aggregates = empty_aggregates()
+        if table.num_rows == 0:
+            return aggregates
+        table = table.set_column(table.schema.get_field_index("player"), "player",
+                                 table["player"].cast(pa.string()))
+        table = table.set_column(table.schema.get_field_index("trump"), "trump", table["trump"].cast(pa.string()))
+        table = table.append_column("hits", table["hit"].cast(pa.int32()))
+
+        game_ids = pc.unique(table["game_id"]).to_pylist()
+        aggregates["games"], aggregates["game_ids"] = len(game_ids), game_ids
+        totals = table.group_by(["game_id", "player"]).aggregate([("score", "sum")])
+        for row in table.group_by("player").aggregate([("hits", "sum"), ("hits", "count"), ("score", "sum")]).to_pylist():
+            aggregates["players"][row["player"]] = {
+                "games": 0, "wins": 0, "rounds": row["hits_count"], "hits": row["hits_sum"], "score": row["score_sum"],
+            }
+        by_game = {}
+        for row in totals.to_pylist():
+            by_game.setdefault(row["game_id"], {})[row["player"]] = row["score_sum"]
+        for scores in by_game.values():
+            for position, player, _ in rank(scores):
+                aggregates["players"][player]["games"] += 1
+                aggregates["players"][player]["wins"] += int(position == 1)
+        for row in table.group_by(["cards", "trump"]).aggregate([("hits", "sum"), ("hits", "count")]).to_pylist():
+            aggregates["hands"][hand_key(row["cards"], row["trump"])] = {"rounds": row["hits_count"], "hits": row["hits_sum"]}
+        for row in table.group_by("round").aggregate([("score", "sum"), ("score", "count")]).to_pylist():
+            aggregates["rounds"][str(row["round"])] = {"rounds": row["score_count"], "score": row["score_sum"]}
+        return aggregates
+
+    # -- queries ------------------------------------------------------------
+
+    def table(self):
+        """Every archived row, loaded once and reused until the files change."""
+        with self._lock:
+            files = self._list("segment-") + self._list("part-")
+            if self._table is None or files != self._files:
+                tables = [pq.read_table(self._path(f), schema=SCHEMA) for f in files]
+                self._table = pa.concat_tables(tables) if tables else SCHEMA.empty_table()
+                self._files = files
+            return self._table
+
+    def hit_rates(self, by, player=None):
+        """Rounds, hits, hit rate and average score grouped by the given columns, optionally for one player."""
+        table = self.table()
+        if player is not None:
+            table = table.filter(pc.equal(table["player"].cast(pa.string()), player))
+        table = table.append_column("hits", table["hit"].cast(pa.int32()))
+        for column in ("player", "trump"):
+            if column in by:
+                table = table.set_column(table.schema.get_field_index(column), column, table[column].cast(pa.string()))
+        grouped = table.group_by(by).aggregate([("hits", "sum"), ("hits", "count"), ("score", "mean")])
+        grouped = grouped.rename_columns([
+            {"hits_sum": "hits", "hits_count": "rounds", "score_mean": "avg_score"}.get(c, c) for c in grouped.column_names
+        ])
+        rate = pc.divide(grouped["hits"].cast(pa.float64()), grouped["rounds"].cast(pa.float64()))
+        return grouped.append_column("hit_rate", rate).sort_by([(c, "ascending") for c in by])
+
+    def __contains__(self, game_id):
+        return game_id in self.aggregates()["game_ids"]
+
+    def __len__(self):
+        return self.aggregates()["games"]
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """Process-wide archive shared by every Streamlit session."""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = Archive()
+        return _archive
@@ -0,0 +1,119 @@
+"""Helpers for driving main.py headlessly with Streamlit's AppTest.
+
+The cookie controller is a browser component, which AppTest can't run,
+so it is swapped for an in-memory jar before the script executes. When
+several apps run in one process, give each its own jar with
+use_own_cookie_jar(). To run those apps' sessions concurrently, as one
+Streamlit server would, call share_runtime() first.
+"""
+import os
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+SESSION_JAR_KEY = "_test_cookie_jar"
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+class FakeCookieController:
+    jar = {}
+
+    def __init__(self, key="cookies"):
+        import streamlit as st
+
+        self.key = key
+        self._jar = st.session_state.get(SESSION_JAR_KEY, self.jar)
+
+    def getAll(self):
+        return dict(self._jar)
+
+    def get(self, name):
+        return self._jar.get(name)
+
+    def set(self, name, value, **options):
+        self._jar[name] = value
+
+    def remove(self, name, **options):
+        self._jar.pop(name, None)
+
+    def refresh(self):
+        pass
+
+
+def install_fake_cookies(jar=None):
+    """Patch the cookie controller; returns the jar the app will read and write."""
+    import streamlit_cookies_controller
+
+    FakeCookieController.jar = {"_ready": "1"} if jar is None else jar
+    streamlit_cookies_controller.CookieController = FakeCookieController
+    return FakeCookieController.jar
+
+
+def use_own_cookie_jar(at, jar=None):
+    """Give one AppTest its own cookie jar (kept in its session_state)."""
+    jar = {"_ready": "1"} if jar is None else jar
+    at.session_state[SESSION_JAR_KEY] = jar
+    return jar
+
+
+def share_runtime():
+    """Run every AppTest in this process on one runtime, as sessions of one server.
+
+    Each AppTest.run() normally installs its own mock runtime and script
+    cache, and clears the runtime when it finishes, which pulls it from
+    under any run still going on another thread. Here one runtime (media
+    files, st.cache_* storage) is installed for the whole process and runs
+    only touch a private copy of the slot. The script is compiled once and
+    shared, with compiles serialized, since parsing on several threads at
+    once breaks CPython 3.11's parser.
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.scriptrunner import script_cache
+    from streamlit.testing.v1 import app_test
+
+    if getattr(app_test.Runtime, "shared", False):
+        return
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.bidi_component_registry = app_test.BidiComponentManager()
+    runtime.bidi_component_registry.discover_and_register_components(start_file_watching=False)
+    Runtime._instance = runtime
+
+    class PrivateRuntimeSlot(Runtime):
+        shared = True
+
+    app_test.Runtime = PrivateRuntimeSlot
+
+    original = script_cache.ScriptCache.get_bytecode
+    lock = threading.Lock()
+    compiled = {}
+
+    def get_bytecode(self, script_path):
+        with lock:
+            if script_path not in compiled:
+                compiled[script_path] = original(self, script_path)
+            return compiled[script_path]
+
+    script_cache.ScriptCache.get_bytecode = get_bytecode
+
+
+def new_app(timeout=60):
+    from streamlit.testing.v1 import AppTest
+
+    return AppTest.from_file(MAIN, default_timeout=timeout)
+
+
+def button(at, label):
+    return next(b for b in at.button if b.label == label)
@@ -0,0 +1,92 @@
+"""Cold-start budget for main.py's Game tab.
+
+Each sample runs in a fresh interpreter: Streamlit's own runtime is warmed
+up on an empty script first, then main.py is executed once under AppTest
+with a cookie jar already present. That run covers every import main.py
+triggers plus the first paint of the Game tab.
+
+    python bench/cold_start.py               # fails (exit 1) if over budget
+    python bench/cold_start.py --budget-ms 400 --samples 7
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Modules the Game tab must not pull in; they belong to Scores, commentary and sync
+HEAVY_MODULES = ("pandas", "openai", "requests", "numpy", "pyarrow")
+DEFAULT_BUDGET_MS = 350
+
+
+def child():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from apptest_utils import install_fake_cookies, new_app
+    from streamlit.testing.v1 import AppTest
+
+    install_fake_cookies()
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+        f.write("import streamlit as st\nst.title('warm up')\n")
+    AppTest.from_file(f.name).run()
+    os.remove(f.name)
+
+    preloaded = {m for m in HEAVY_MODULES if m in sys.modules}
+    at = new_app()
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    loaded = sorted(m for m in HEAVY_MODULES if m in sys.modules and m not in preloaded)
+    print(json.dumps({
+        "first_paint_ms": elapsed * 1000,
+        "title": [t.value for t in at.title],
+        "exception": [str(e.value) for e in at.exception],
+        "heavy_modules": loaded,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    results = []
+    for _ in range(args.samples):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child"],
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    times = [r["first_paint_ms"] for r in results]
+    median = statistics.median(times)
+    heavy = sorted({m for r in results for m in r["heavy_modules"]})
+    errors = [e for r in results for e in r["exception"]]
+    print(f"Game tab cold start: median {median:.0f} ms, min {min(times):.0f} ms, max {max(times):.0f} ms "
+          f"(budget {args.budget_ms:.0f} ms, {args.samples} samples)")
+
+    failed = False
+    if errors:
+        print(f"FAIL: script raised: {errors[0]}")
+        failed = True
+    if not any(r["title"] for r in results):
+        print("FAIL: Game tab did not render")
+        failed = True
+    if heavy:
+        print(f"FAIL: Game tab imported {', '.join(heavy)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: over budget by {median - args.budget_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Multi-session load harness for main.py.
+
+Drives simulated games concurrently through the whole flow: start game,
+13 rounds of guesses and results, the Scores tab with AI commentary and
+speech, then the sheet submission. Every external service is replaced by
+a local stand-in from fake_servers.py with configurable latency and
+failure rate, so nothing live is touched.
+
+    python bench/load_harness.py --sessions 20 --processes 2 --threads 10
+    python bench/load_harness.py --sessions 8 --latency 0.2 --failure-rate 0.1 --json out.json
+
+Each worker process stands in for one app instance: its sessions share the
+process's runtime, game store, outbox, caches and prefetcher, and --threads
+of them play at once, the way concurrent browser tabs hit one Streamlit
+server (see share_runtime). Results are reported overall and per instance.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from apptest_utils import ROOT, button, install_fake_cookies, new_app, share_runtime, use_own_cookie_jar  # noqa: E402
+
+sys.path.insert(0, ROOT)
+from engine import ROUNDS  # noqa: E402
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Session:
+    """One simulated table driving its own AppTest."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.timings = []  # (step, seconds)
+        self.game_id = None
+        self.at = new_app()
+        use_own_cookie_jar(self.at)
+        self.at.session_state["openai_key"] = "sk-load-test"
+        self.at.session_state["elevenlabs_key"] = "xi-load-test"
+
+    def run(self, step, widget=None):
+        start = time.perf_counter()
+        (widget or self.at).run()
+        self.timings.append((step, time.perf_counter() - start))
+        if self.at.exception:
+            raise RuntimeError(f"{step}: {self.at.exception[0].value}")
+
+    def click(self, step, label, where=None):
+        try:
+            widget = button(where or self.at, label)
+        except StopIteration:
+            shown = [w.value for w in self.at.warning] + [w.value for w in self.at.info]
+            raise RuntimeError(f"{step}: no '{label}' button (page says {shown})") from None
+        start = time.perf_counter()
+        widget.click().run()
+        self.timings.append((step, time.perf_counter() - start))
+        if self.at.exception:
+            raise RuntimeError(f"{step}: {self.at.exception[0].value}")
+
+    def play_round(self, round_num):
+        cards = ROUNDS[round_num]
+        inputs = self.at.number_input
+        bids = [self.rng.randint(0, cards) for _ in inputs]
+        if sum(bids) == cards:  # the hook: the last bidder can't make it add up
+            bids[-1] = bids[-1] + 1 if bids[-1] < cards else bids[-1] - 1
+        for widget, bid in zip(inputs, bids):
+            widget.set_value(bid)
+        self.run("enter_guesses")
+        self.click("submit_guesses", "Submit Guesses")
+
+        tricks = [0] * len(self.at.number_input)
+        for _ in range(cards):
+            tricks[self.rng.randrange(len(tricks))] += 1
+        for widget, won in zip(self.at.number_input, tricks):
+            widget.set_value(won)
+        self.run("enter_tricks")
+        self.click("submit_results", "Submit Results")
+
+    def play(self):
+        self.run("first_paint")
+        self.click("start_game", "Start Game")
+        self.game_id = self.at.session_state["game_start_time"]
+        for round_num in range(len(ROUNDS)):
+            self.play_round(round_num)
+        self.at.sidebar.radio[0].set_value("Scores")
+        self.run("scores_tab")
+        if any(b.label == "🔊 Speak Summary" for b in self.at.button):
+            self.click("speak_summary", "🔊 Speak Summary")
+        self.at.text_input(key="sheet_password").set_value("load-test")
+        self.click("sheet_submit", "Submit Final Scores to Sheet")
+
+
+def worker(seeds, threads):
+    # One outbox database per process, or workers would deliver each other's jobs
+    os.environ["WHIST_OUTBOX_DB"] = os.path.join(os.environ["WHIST_WORK_DIR"], f"outbox-{os.getpid()}.sqlite3")
+    # Likewise the archive, which also keeps the real one free of simulated games
+    os.environ["WHIST_ARCHIVE_DIR"] = os.path.join(os.environ["WHIST_WORK_DIR"], f"archive-{os.getpid()}")
+    install_fake_cookies()
+    share_runtime()
+    before = rss_bytes()
+    start = time.perf_counter()
+
+    def one(seed):
+        session = Session(seed)
+        try:
+            session.play()
+            return session.timings, session.game_id, None
+        except Exception as e:
+            return session.timings, session.game_id, f"{type(e).__name__}: {e}"
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(one, seeds))
+    elapsed = time.perf_counter() - start
+    # Sessions on one instance must never end up sharing a stored game
+    game_ids = [game_id for _, game_id, _ in results if game_id]
+    shared = sorted({g for g in game_ids if game_ids.count(g) > 1})
+
+    from outbox import get_outbox
+    outbox = get_outbox()
+    drained = outbox.wait_idle(timeout=60)
+    # GET /latest is a 404 until some game has been started; that just means nothing to link
+    failed = outbox._query(
+        "SELECT kind, code, error FROM jobs WHERE status = 'failed' "
+        "AND NOT (kind = 'link_previous' AND code = 404)"
+    )
+    return {
+        "pid": os.getpid(),
+        "timings": [t for timings, _, _ in results for t in timings],
+        "errors": [e for _, _, e in results if e] + [f"sessions share game {g}" for g in shared],
+        "sessions": len(seeds),
+        "threads": min(threads, len(seeds)),
+        "elapsed": elapsed,
+        "rss_growth": rss_bytes() - before,
+        "outbox_drained": drained,
+        "outbox_failed": failed,
+    }
+
+
+def start_stand_ins(latency, failure_rate):
+    import fake_servers
+
+    servers = {
+        name: fake_servers.serve(name, latency=latency, failure_rate=failure_rate)
+        for name in ("viewer", "saver", "openai", "elevenlabs")
+    }
+    url = {name: f"http://127.0.0.1:{s.server_port}" for name, s in servers.items()}
+    work_dir = tempfile.mkdtemp(prefix="whist-load-")
+    os.environ.update({
+        "WHIST_VIEWER_URL": url["viewer"],
+        "WHIST_SAVER_URL": url["saver"],
+        "WHIST_OPENAI_BASE_URL": url["openai"] + "/v1",
+        "WHIST_ELEVENLABS_URL": url["elevenlabs"],
+        "WHIST_WORK_DIR": work_dir,
+        "WHIST_GAME_DIR": os.path.join(work_dir, "games"),
+        "WHIST_COMMENTARY_CACHE": os.path.join(work_dir, "commentary"),
+        "WHIST_AUDIO_CACHE": os.path.join(work_dir, "audio"),
+    })
+    return servers, work_dir
+
+
+def instance_summary(result):
+    """Throughput and latency for the sessions one worker process (app instance) hosted."""
+    ms = [s * 1000 for _, s in result["timings"]]
+    elapsed = result["elapsed"]
+    return {
+        "pid": result["pid"],
+        "sessions": result["sessions"],
+        "threads": result["threads"],
+        "elapsed_seconds": elapsed,
+        "reruns_per_second": len(ms) / elapsed if elapsed else 0,
+        "games_per_minute": (result["sessions"] - len(result["errors"])) / elapsed * 60 if elapsed else 0,
+        "rerun_ms": {"p50": percentile(ms, 50), "p99": percentile(ms, 99)},
+        "memory_per_session_kb": result["rss_growth"] / result["sessions"] / 1024,
+        "errors": len(result["errors"]),
+    }
+
+
+def report(results, wall, args):
+    timings = [t for r in results for t in r["timings"]]
+    errors = [e for r in results for e in r["errors"]]
+    sessions = sum(r["sessions"] for r in results)
+    by_step = {}
+    for step, seconds in timings:
+        by_step.setdefault(step, []).append(seconds * 1000)
+    all_ms = [s * 1000 for _, s in timings]
+
+    summary = {
+        "sessions": sessions,
+        "processes": args.processes,
+        "threads": args.threads,
+        "latency": args.latency,
+        "failure_rate": args.failure_rate,
+        "wall_seconds": wall,
+        "reruns": len(all_ms),
+        "reruns_per_second": len(all_ms) / wall if wall else 0,
+        "games_per_minute": (sessions - len(errors)) / wall * 60 if wall else 0,
+        "rerun_ms": {"p50": percentile(all_ms, 50), "p99": percentile(all_ms, 99)},
+        "steps": {
+            step: {"n": len(v), "p50": percentile(v, 50), "p99": percentile(v, 99), "mean": statistics.fmean(v)}
+            for step, v in by_step.items()
+        },
+        "memory_per_session_kb": statistics.fmean(r["rss_growth"] / r["sessions"] for r in results) / 1024,
+        "outbox_failed": [f for r in results for f in r["outbox_failed"]],
+        "outbox_drained": all(r["outbox_drained"] for r in results),
+        "errors": errors,
+        "instances": [instance_summary(r) for r in results],
+    }
+
+    print(f"{sessions} sessions over {args.processes} process(es) x {args.threads} thread(s), "
+          f"stand-in latency {args.latency * 1000:.0f} ms, failure rate {args.failure_rate:.0%}")
+    print(f"wall {wall:.1f} s | {summary['reruns']} reruns | {summary['reruns_per_second']:.1f} reruns/s | "
+          f"{summary['games_per_minute']:.1f} games/min")
+    print(f"rerun latency p50 {summary['rerun_ms']['p50']:.1f} ms, p99 {summary['rerun_ms']['p99']:.1f} ms")
+    print(f"memory growth per session ~{summary['memory_per_session_kb']:.0f} KB")
+    print(f"outbox: drained={summary['outbox_drained']} failed jobs={len(summary['outbox_failed'])}")
+    for kind, code, error in summary["outbox_failed"][:5]:
+        print(f"  failed {kind}: {error or code}")
+    print()
+    print(f"{'step':<16}{'n':>6}{'p50 ms':>10}{'p99 ms':>10}")
+    for step, s in summary["steps"].items():
+        print(f"{step:<16}{s['n']:>6}{s['p50']:>10.1f}{s['p99']:>10.1f}")
+    print()
+    print(f"{'instance':<10}{'sessions':>9}{'at once':>8}{'reruns/s':>10}{'games/min':>10}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'KB/session':>11}{'errors':>7}")
+    for i in summary["instances"]:
+        print(f"{i['pid']:<10}{i['sessions']:>9}{i['threads']:>8}{i['reruns_per_second']:>10.1f}"
+              f"{i['games_per_minute']:>10.1f}{i['rerun_ms']['p50']:>9.1f}{i['rerun_ms']['p99']:>9.1f}"
+              f"{i['memory_per_session_kb']:>11.0f}{i['errors']:>7}")
+    for error in errors[:5]:
+        print(f"ERROR {error}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=2, help="app instances")
+    parser.add_argument("--threads", type=int, default=4, help="sessions playing at once on each instance")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added by every stand-in")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of stand-in requests failing with 503")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the summary here")
+    args = parser.parse_args()
+
+    servers, _ = start_stand_ins(args.latency, args.failure_rate)
+    seeds = [args.seed + i for i in range(args.sessions)]
+    chunks = [seeds[i::args.processes] for i in range(args.processes) if seeds[i::args.processes]]
+
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(len(chunks)) as pool:
+        results = pool.starmap(worker, [(chunk, args.threads) for chunk in chunks])
+    wall = time.perf_counter() - start
+
+    summary = report(results, wall, args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    for server in servers.values():
+        server.shutdown()
+    sys.exit(1 if summary["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
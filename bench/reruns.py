@@ -0,0 +1,223 @@
+"""Per-interaction rerun benchmarks for main.py.
+
+Each interaction is scripted headlessly with AppTest from a fresh session:
+change a guess, submit guesses, enter tricks, submit results, replay a
+round and switch to the Scores tab. For every one the wall time of the
+triggering run and the number of script executions it caused (st.rerun()
+included) are recorded and checked against bench/baselines/reruns.json.
+
+Times are gated relative to a reference measured in the same run: a button
+click rerunning a one-widget script, timed just before each sample. That
+takes the machine (and how busy it is) out of the comparison, so baselines
+recorded on one box hold on another.
+
+    python bench/reruns.py              # fails (exit 1) on a regression
+    python bench/reruns.py --update     # re-record the baselines
+    python bench/reruns.py --only submit_guesses --samples 15
+    python bench/reruns.py --counts-only  # only check script executions
+
+An interaction regresses if it needs more executions than its baseline, or
+if its median time, in multiples of the reference, exceeds the baseline by
+more than --tolerance (plus a few milliseconds of slack, so tiny timings
+don't flap).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from apptest_utils import ROOT, button, install_fake_cookies, new_app, use_own_cookie_jar  # noqa: E402
+
+sys.path.insert(0, ROOT)
+from engine import ROUNDS  # noqa: E402
+
+BASELINES = os.path.join(HERE, "baselines", "reruns.json")
+SLACK_MS = 5.0
+REFERENCE_SCRIPT = "import streamlit as st\nst.button('Go')\n"
+
+_executions = [0]
+
+
+def count_executions():
+    """Count every script execution, including the ones st.rerun() starts inside a run."""
+    from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+
+    original = ScriptRunContext.reset
+
+    def reset(self, *args, **kwargs):
+        _executions[0] += 1
+        return original(self, *args, **kwargs)
+
+    ScriptRunContext.reset = reset
+
+
+# -- getting a session into shape -------------------------------------------
+
+def started():
+    at = new_app()
+    use_own_cookie_jar(at)
+    at.run()
+    button(at, "Start Game").click().run()
+    return at
+
+
+def set_guesses(at):
+    # Nobody bids, which never trips the hook while the round has cards
+    for widget in at.number_input:
+        widget.set_value(0)
+
+
+def guessed():
+    at = started()
+    set_guesses(at)
+    at.run()
+    button(at, "Submit Guesses").click().run()
+    return at
+
+
+def set_tricks(at):
+    first, *rest = at.number_input
+    first.set_value(ROUNDS[0])
+    for widget in rest:
+        widget.set_value(0)
+
+
+def one_round_played():
+    at = guessed()
+    set_tricks(at)
+    at.run()
+    button(at, "Submit Results").click().run()
+    return at
+
+
+def replay_button(at):
+    return next(b for b in at.sidebar.button if b.label.startswith("Replay Round"))
+
+
+# name -> (setup returning an AppTest, interaction returning the element to run)
+INTERACTIONS = {
+    "change_guess": (started, lambda at: at.number_input[0].set_value(1)),
+    "submit_guesses": (lambda: _ready(started, set_guesses), lambda at: button(at, "Submit Guesses").click()),
+    "enter_tricks": (guessed, lambda at: at.number_input[0].set_value(1)),
+    "submit_results": (lambda: _ready(guessed, set_tricks), lambda at: button(at, "Submit Results").click()),
+    "replay_round": (one_round_played, lambda at: replay_button(at).click()),
+    "switch_to_scores": (one_round_played, lambda at: at.sidebar.radio[0].set_value("Scores")),
+}
+
+
+def _ready(setup, fill):
+    at = setup()
+    fill(at)
+    at.run()
+    return at
+
+
+def reference_run():
+    """Time one rerun of a near-empty script: AppTest and Streamlit overhead only."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_string(REFERENCE_SCRIPT)
+    at.run()
+    element = at.button[0].click()
+    start = time.perf_counter()
+    element.run()
+    return (time.perf_counter() - start) * 1000
+
+
+def measure(name, samples):
+    setup, interact = INTERACTIONS[name]
+    times, references, executions = [], [], []
+    for i in range(samples + 1):
+        reference = reference_run()
+        at = setup()
+        element = interact(at)
+        _executions[0] = 0
+        start = time.perf_counter()
+        element.run()
+        elapsed = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].value}")
+        if i:  # the first pass only warms caches and imports
+            times.append(elapsed * 1000)
+            references.append(reference)
+            executions.append(_executions[0])
+    ms, reference = statistics.median(times), statistics.median(references)
+    return {"ms": ms, "ratio": ms / reference, "reference_ms": reference, "executions": max(executions)}
+
+
+def isolate():
+    """Point the app's outbox and game store at local stand-ins and a scratch directory."""
+    import fake_servers
+
+    servers = [fake_servers.serve(name) for name in ("viewer", "saver")]
+    work_dir = tempfile.mkdtemp(prefix="whist-reruns-")
+    os.environ.update({
+        "WHIST_VIEWER_URL": f"http://127.0.0.1:{servers[0].server_port}",
+        "WHIST_SAVER_URL": f"http://127.0.0.1:{servers[1].server_port}",
+        "WHIST_OUTBOX_DB": os.path.join(work_dir, "outbox.sqlite3"),
+        "WHIST_GAME_DIR": os.path.join(work_dir, "games"),
+        "WHIST_ARCHIVE_DIR": os.path.join(work_dir, "archive"),
+    })
+    return servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=7)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown over baseline (0.5 = +50%%)")
+    parser.add_argument("--only", action="append", choices=list(INTERACTIONS))
+    parser.add_argument("--update", action="store_true", help="write the results as the new baselines")
+    parser.add_argument("--counts-only", action="store_true", help="don't gate on times, only on script executions")
+    args = parser.parse_args()
+
+    isolate()
+    install_fake_cookies()
+    count_executions()
+
+    try:
+        with open(BASELINES) as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {}
+
+    results = {}
+    failures = []
+    print(f"{'interaction':<18}{'ms':>9}{'ref ms':>8}{'x ref':>8}{'base':>8}{'runs':>6}{'base':>6}")
+    for name in args.only or INTERACTIONS:
+        result = results[name] = measure(name, args.samples)
+        base = baselines.get(name)
+        print(f"{name:<18}{result['ms']:>9.1f}{result['reference_ms']:>8.1f}{result['ratio']:>8.1f}"
+              f"{base.get('ratio', float('nan')) if base else float('nan'):>8.1f}"
+              f"{result['executions']:>6}{base['executions'] if base else '-':>6}")
+        if base is None or args.update:
+            continue
+        if result["executions"] > base["executions"]:
+            failures.append(f"{name}: {result['executions']} script executions, baseline {base['executions']}")
+        if args.counts_only or "ratio" not in base:  # older baselines only recorded absolute times
+            continue
+        limit = base["ratio"] * (1 + args.tolerance) + SLACK_MS / result["reference_ms"]
+        if result["ratio"] > limit:
+            failures.append(f"{name}: {result['ratio']:.1f}x the reference run, over the {limit:.1f}x limit"
+                            f" ({result['ms']:.1f} ms, reference {result['reference_ms']:.1f} ms)")
+
+    if args.update:
+        baselines.update(results)
+        os.makedirs(os.path.dirname(BASELINES), exist_ok=True)
+        with open(BASELINES, "w") as f:
+            json.dump({k: {"ratio": round(v["ratio"], 2), "ms": round(v["ms"], 1), "executions": v["executions"]}
+                       for k, v in baselines.items()}, f, indent=2)
+            f.write("\n")
+        print(f"baselines written to {os.path.relpath(BASELINES, ROOT)}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Score, replay and bulk import games without the Streamlit UI.
+
+Games are applied with the same rules as main.py (GameLog plus the hook
+and trick-total checks in engine). Streamlit is never imported, so a run
+starts in well under a second.
+
+    python cli.py decode cookie-value-round12
+    python cli.py apply --state-file cookie-value-round12 --guesses 2,1,3,0 --tricks 2,1,3,1
+    python cli.py apply --players Campbell,Russell,Nathan,Dave --guesses 3,2,1,0
+    python cli.py import old-sheets.jsonl > games.jsonl
+    python cli.py serve --port 8770
+
+A game for `import` and the HTTP API is a JSON object:
+
+    {"state": "<saved state blob>"}                     or
+    {"players": ["Campbell", ...], "game_id": "..."}    a new game, plus any of
+    "rounds": [[[guesses], [tricks]], ...]              whole rounds, e.g. from a paper sheet
+    "events": [{"guesses": [...]}, {"tricks": [...]}, {"rewind": 3}, {"redo": true}]
+
+Guesses and tricks are lists in seat order or {player: n} dicts, and an
+event may give "round" (1-based) to check it lands where expected. Import
+files hold one game per line, or a JSON list of games. Each game's
+result (or its error) is written as one line of JSON:
+
+    {"ok": true, "game_id": ..., "state": "<blob>", "round_num": ..., "totals": ..., "rounds": [...]}
+
+The HTTP API takes the same objects: POST /games with one game or a list.
+"""
+import argparse
+import json
+import sys
+
+from engine import RuleError, cards_in_round, rank, round_score, trump_for_round
+from game_log import GameLog
+from state_codec import StateDecodeError, decode_state, encode_state, parse_game_ref
+
+DEFAULT_PORT = 8770
+
+
+class InputError(ValueError):
+    pass
+
+
+# -- applying games ---------------------------------------------------------
+
+def _by_player(log, values, what):
+    if isinstance(values, dict):
+        unknown = set(values) - set(log.player_order)
+        if unknown:
+            raise InputError(f"unknown player(s) in {what}: {', '.join(sorted(unknown))}")
+        return {p: int(v) for p, v in values.items()}
+    if len(values) != len(log.player_order):
+        raise InputError(f"{what} needs {len(log.player_order)} values, got {len(values)}")
+    return {p: int(v) for p, v in zip(log.player_order, values)}
+
+
+def load_game(game):
+    """The GameLog a game object starts from (a saved state, a stored game, or new players)."""
+    raw = game.get("state")
+    if raw is not None:
+        game_id = parse_game_ref(raw)
+        if game_id is not None:
+            from game_store import get_store
+
+            log, _ = get_store().get(game_id)
+            if log is None:
+                raise InputError(f"no stored game {game_id!r}")
+            return log
+        state = decode_state(raw.strip())
+        if not state or not state.get("player_order"):
+            raise InputError("state holds no game")
+        return GameLog.from_state(state)
+    players = game.get("players")
+    if not players:
+        raise InputError("a game needs a state or players")
+    if len(set(players)) != len(players):
+        raise InputError("player names must be different")
+    return GameLog(game.get("game_id"), players)
+
+
+def apply_event(log, event):
+    expected = event.get("round")
+    if expected is not None and expected != log.round_num + 1:
+        raise InputError(f"event is for round {expected} but the game is on round {log.round_num + 1}")
+    if "guesses" in event:
+        log.submit_guesses(_by_player(log, event["guesses"], "guesses"))
+    elif "tricks" in event:
+        log.submit_results(_by_player(log, event["tricks"], "tricks"))
+    elif "rewind" in event:
+        log.rewind(int(event["rewind"]) - 1)
+    elif event.get("redo"):
+        log.redo()
+    else:
+        raise InputError(f"unknown event {event!r}")
+
+
+def apply_game(game):
+    log = load_game(game)
+    for guesses, tricks in game.get("rounds") or []:
+        apply_event(log, {"guesses": guesses})
+        apply_event(log, {"tricks": tricks})
+    for event in game.get("events") or []:
+        apply_event(log, event)
+    return log
+
+
+def summary(log):
+    """The result line for a game: its new state blob and the scoreboard."""
+    rounds = []
+    for r, (guesses, tricks) in enumerate(log.rounds):
+        rounds.append({
+            "round": r + 1,
+            "cards": cards_in_round(r),
+            "trump": trump_for_round(r),
+            "guesses": dict(zip(log.player_order, guesses)),
+            "tricks": dict(zip(log.player_order, tricks)),
+            "scores": {p: round_score(g, t) for p, g, t in zip(log.player_order, guesses, tricks)},
+        })
+    return {
+        "ok": True,
+        "game_id": log.game_id,
+        "state": encode_state(log.to_state()),
+        "players": log.player_order,
+        "round_num": log.round_num,
+        "awaiting_results": log.awaiting_results,
+        "guesses": dict(zip(log.player_order, log.pending)) if log.pending else {},
+        "game_over": log.game_over,
+        "totals": log.totals,
+        "standings": [list(row) for row in rank(log.totals)],
+        "rounds": rounds,
+    }
+
+
+def run_game(game):
+    """Apply one game object; rule and input errors are reported in the result, not raised."""
+    try:
+        if isinstance(game, InputError):
+            raise game
+        if not isinstance(game, dict):
+            raise InputError("a game must be a JSON object")
+        return summary(apply_game(game))
+    except (RuleError, StateDecodeError, InputError, KeyError, TypeError, ValueError) as e:
+        return {"ok": False, "game_id": game.get("game_id") if isinstance(game, dict) else None,
+                "error": str(e)}
+
+
+def read_games(stream):
+    """Game objects from a file: a JSON list, or one object per line."""
+    text = stream.read()
+    if text.lstrip().startswith("["):
+        try:
+            games = json.loads(text)
+        except json.JSONDecodeError as e:
+            yield InputError(f"invalid JSON list: {e}")
+            return
+        yield from games
+        return
+    for number, line in enumerate(text.splitlines(), start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield InputError(f"line {number}: {e}")
+
+
+# -- HTTP API ---------------------------------------------------------------
+
+def make_server(host, port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class ApiHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == "/health":
+                self.send_json(200, {"ok": True})
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/games":
+                self.send_json(404, {"error": "not found"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+            except json.JSONDecodeError as e:
+                self.send_json(400, {"error": f"invalid JSON: {e}"})
+                return
+            if isinstance(body, list):
+                self.send_json(200, [run_game(game) for game in body])
+            else:
+                result = run_game(body)
+                self.send_json(200 if result["ok"] else 422, result)
+
+        def send_json(self, status, data):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return ThreadingHTTPServer((host, port), ApiHandler)
+
+
+# -- command line -----------------------------------------------------------
+
+def _numbers(text):
+    return [int(n) for n in text.split(",")]
+
+
+def _emit(result, out):
+    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+    return result["ok"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    decode = commands.add_parser("decode", help="show the game in a saved state blob")
+    decode.add_argument("state_file", help="file holding the blob ('-' for stdin)")
+
+    apply = commands.add_parser("apply", help="apply guesses and results to one game")
+    source = apply.add_mutually_exclusive_group(required=True)
+    source.add_argument("--state", help="saved state blob")
+    source.add_argument("--state-file", help="file holding the blob ('-' for stdin)")
+    source.add_argument("--players", help="start a new game: comma-separated names in seat order")
+    apply.add_argument("--game-id", help="game_id for a new game")
+    apply.add_argument("--guesses", type=_numbers, action="append", default=[],
+                       help="comma-separated guesses in seat order (repeat for several rounds)")
+    apply.add_argument("--tricks", type=_numbers, action="append", default=[],
+                       help="comma-separated tricks in seat order (repeat for several rounds)")
+    apply.add_argument("--rewind", type=int, metavar="ROUND", help="rewind to the start of a round first")
+
+    bulk = commands.add_parser("import", help="apply every game in one or more files")
+    bulk.add_argument("files", nargs="+", help="JSON-lines or JSON-list files ('-' for stdin)")
+
+    serve = commands.add_parser("serve", help="serve the JSON API")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    args = parser.parse_args(argv)
+    out = sys.stdout
+
+    def read(path):
+        if path == "-":
+            return sys.stdin.read()
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    if args.command == "decode":
+        return 0 if _emit(run_game({"state": read(args.state_file)}), out) else 1
+
+    if args.command == "apply":
+        if args.players:
+            game = {"players": args.players.split(","), "game_id": args.game_id}
+        else:
+            game = {"state": args.state if args.state is not None else read(args.state_file)}
+        events = [{"rewind": args.rewind}] if args.rewind else []
+        # Each --guesses is followed by the --tricks for the same round, if given
+        for i, guesses in enumerate(args.guesses):
+            events.append({"guesses": guesses})
+            if i < len(args.tricks):
+                events.append({"tricks": args.tricks[i]})
+        events += [{"tricks": tricks} for tricks in args.tricks[len(args.guesses):]]
+        game["events"] = events
+        return 0 if _emit(run_game(game), out) else 1
+
+    if args.command == "import":
+        failed = 0
+        for path in args.files:
+            if path == "-":
+                games = read_games(sys.stdin)
+            else:
+                with open(path, encoding="utf-8") as f:
+                    games = list(read_games(f))
+            for game in games:
+                failed += not _emit(run_game(game), out)
+        if failed:
+            print(f"{failed} game(s) failed", file=sys.stderr)
+        return 1 if failed else 0
+
+    server = make_server(args.host, args.port)
+    print(f"whist API listening on http://{args.host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
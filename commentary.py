@@ -0,0 +1,71 @@
+"""AI match commentary: prompt building, on-disk cache and token streaming."""
+import json
+import os
+
+import tracing
+from disk_cache import DiskCache, content_key
+from highlights import digest
+
+MODEL = "gpt-4-turbo"
+PROMPT_VERSION = 2
+BASE_URL = os.environ.get("WHIST_OPENAI_BASE_URL")  # e.g. a local fake_servers.py instance
+CACHE_DIR = os.environ.get("WHIST_COMMENTARY_CACHE", os.path.join(".whist", "commentary"))
+CACHE_BYTES = 5 * 1024 * 1024
+
+STYLES = {
+    "Football": "You're a lively British Premier League football commentator with a flair for drama and humour. Think John Motson meets Match of the Day.",
+    "Formula 1": "You're a fast-paced, excitable British Formula 1 commentator. Think David Croft with a touch of Martin Brundle, recapping key moments lap by lap.",
+}
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(CACHE_DIR, CACHE_BYTES, suffix=".md")
+    return _cache
+
+
+def build_prompt(scores_by_round):
+    return f"""Use dramatic, humorous, and sports-style language to summarise a competitive countdown whist game.
+        Highlight standout performances, tight rounds, unexpected plays, and pivotal moments. Be aware that Campbell and Russell are scottish brothers, Dave was a postman from Skye and Nathan is English. Be sure to slag off Russell at any opportunity.
+
+        Here are the match highlights:
+        {digest(scores_by_round)}"""
+
+
+def cache_key(scores_by_round, style):
+    return content_key(PROMPT_VERSION, MODEL, style, json.dumps(scores_by_round, sort_keys=True))
+
+
+def cached_commentary(scores_by_round, style):
+    data = get_cache().get(cache_key(scores_by_round, style))
+    return data.decode("utf-8") if data is not None else None
+
+
+def stream_commentary(api_key, scores_by_round, style):
+    """Yield commentary text as it arrives; the full text is cached once the stream ends."""
+    import openai
+
+    client = openai.OpenAI(api_key=api_key, base_url=BASE_URL)
+    with tracing.span("openai.commentary", style=style) as span:
+        stream = client.chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": STYLES[style]},
+                {"role": "user", "content": build_prompt(scores_by_round)},
+            ],
+            temperature=0.9,
+            stream=True,
+        )
+        parts = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                parts.append(text)
+                yield text
+        span.set(chars=sum(map(len, parts)))
+    get_cache().put(cache_key(scores_by_round, style), "".join(parts).encode("utf-8"))
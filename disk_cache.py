@@ -0,0 +1,88 @@
+"""Small content-addressed file cache with size-based LRU eviction."""
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+def content_key(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class DiskCache:
+    def __init__(self, directory, max_bytes, suffix=""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        self._touch(path)
+        return data
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def lookup(self, key):
+        """Path of a cached entry (marked as used), or None."""
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        return path
+
+    def put(self, key, data):
+        with self.writer(key) as f:
+            f.write(data)
+
+    @contextmanager
+    def writer(self, key):
+        """Stream an entry to disk; it only becomes visible if the block finishes cleanly."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                yield f
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self.evict()
+
+    def _touch(self, path):
+        # mtime doubles as "last used" for eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.startswith(".tmp-"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
@@ -0,0 +1,191 @@
+"""Countdown whist rules, usable without Streamlit.
+
+Arrays are laid out seat-major in the order players were entered, so seat
+0 is the first dealer. Unplayed rounds hold -1.
+"""
+from dataclasses import dataclass
+
+PLAYERS = ["Campbell", "Russell", "Nathan", "Dave"]
+SUITS = ["Hearts ♥️", "Spades ♠️", "Diamonds ♦️", "Clubs ♣️", "No Trumps 🙅🏻"]
+ROUNDS = list(range(7, 0, -1)) + list(range(2, 8))  # 7 to 1, then 2 to 7
+
+UNPLAYED = -1
+
+
+class RuleError(ValueError):
+    pass
+
+
+def round_score(guess, tricks):
+    return 10 + tricks if guess == tricks else tricks
+
+
+def tricks_from_score(score):
+    # A hit scores 10 + tricks and a miss scores tricks (never more than 7)
+    return score - 10 if score >= 10 else score
+
+
+def cards_in_round(round_num):
+    return ROUNDS[round_num]
+
+
+def trump_for_round(round_num):
+    return SUITS[round_num % len(SUITS)]
+
+
+def dealer_index(round_num, num_players):
+    return round_num % num_players
+
+
+def bidding_order(player_order, round_num):
+    """Players in bidding order for a round: left of the dealer first, dealer last."""
+    d = dealer_index(round_num, len(player_order))
+    return player_order[d + 1:] + player_order[:d + 1]
+
+
+def hook_value(cards, earlier_bids):
+    """The guess the last bidder is not allowed to make (may be negative, i.e. no restriction)."""
+    return cards - sum(earlier_bids)
+
+
+def check_guesses(player_order, round_num, guesses):
+    cards = cards_in_round(round_num)
+    order = bidding_order(player_order, round_num)
+    missing = [p for p in order if p not in guesses]
+    if missing:
+        raise RuleError(f"missing guesses for {', '.join(missing)}")
+    for p in order:
+        if not 0 <= guesses[p] <= cards:
+            raise RuleError(f"{p}'s guess must be between 0 and {cards}")
+    banned = hook_value(cards, [guesses[p] for p in order[:-1]])
+    if guesses[order[-1]] == banned:
+        raise RuleError(f"{order[-1]}'s guess can't be {banned}")
+
+
+def check_tricks(player_order, round_num, tricks):
+    cards = cards_in_round(round_num)
+    total = sum(tricks.get(p, 0) for p in player_order)
+    if total != cards:
+        raise RuleError(f"Total tricks must equal {cards}. Currently: {total}")
+
+
+def rank(totals):
+    """Competition ranking (1, 1, 3, ...) of a {player: total} dict, best first."""
+    ordered = sorted(totals.items(), key=lambda x: x[1], reverse=True)
+    rankings, last_score, current_rank = [], None, 0
+    for offset, (player, score) in enumerate(ordered, start=1):
+        if score != last_score:
+            current_rank = offset
+        rankings.append((current_rank, player, score))
+        last_score = score
+    return rankings
+
+
+class Game:
+    """One game held as (rounds x players) guess and trick arrays."""
+
+    def __init__(self, player_order, guesses=None, tricks=None):
+        import numpy as np
+
+        self.player_order = list(player_order)
+        shape = (len(ROUNDS), len(self.player_order))
+        self.guesses = np.full(shape, UNPLAYED, dtype=np.int16) if guesses is None else np.asarray(guesses, dtype=np.int16)
+        self.tricks = np.full(shape, UNPLAYED, dtype=np.int16) if tricks is None else np.asarray(tricks, dtype=np.int16)
+
+    @property
+    def rounds_played(self):
+        return int((self.tricks[:, 0] != UNPLAYED).sum())
+
+    def play_round(self, guesses, tricks, check=True):
+        r = self.rounds_played
+        if r >= len(ROUNDS):
+            raise RuleError("game is already over")
+        if check:
+            check_guesses(self.player_order, r, guesses)
+            check_tricks(self.player_order, r, tricks)
+        self.guesses[r] = [guesses[p] for p in self.player_order]
+        self.tricks[r] = [tricks[p] for p in self.player_order]
+
+    def truncate(self, rounds):
+        self.guesses[rounds:] = UNPLAYED
+        self.tricks[rounds:] = UNPLAYED
+
+    def scores(self):
+        return score_batch(self.guesses[None], self.tricks[None]).scores[0]
+
+    def totals(self):
+        return dict(zip(self.player_order, self.scores().sum(axis=0).tolist()))
+
+    def rankings(self):
+        return rank(self.totals())
+
+    def scores_by_round(self):
+        scores = self.scores()
+        return [
+            {p: {"guess": int(self.guesses[r, i]), "score": int(scores[r, i])} for i, p in enumerate(self.player_order)}
+            for r in range(self.rounds_played)
+        ]
+
+    @classmethod
+    def from_scores_by_round(cls, player_order, scores_by_round):
+        game = cls(player_order)
+        for r, round_data in enumerate(scores_by_round):
+            for i, p in enumerate(game.player_order):
+                game.guesses[r, i] = round_data[p]["guess"]
+                game.tricks[r, i] = tricks_from_score(round_data[p]["score"])
+        return game
+
+
+@dataclass
+class BatchResult:
+    # numpy arrays; imported lazily so the rules above stay cheap to import
+    scores: "np.ndarray"           # (games, rounds, players), 0 for unplayed rounds
+    running: "np.ndarray"          # cumulative scores after each round
+    totals: "np.ndarray"           # (games, players)
+    ranks: "np.ndarray"            # (games, players), competition ranking, 1 = best
+    hook_violations: "np.ndarray"  # (games, rounds) bool: bids summed to the cards dealt
+    trick_violations: "np.ndarray" # (games, rounds) bool: tricks didn't add up to the cards dealt
+    rounds_played: "np.ndarray"    # (games,)
+
+
+def score_batch(guesses, tricks):
+    """Score many games at once from (games x rounds x players) arrays."""
+    import numpy as np
+
+    guesses = np.asarray(guesses, dtype=np.int16)
+    tricks = np.asarray(tricks, dtype=np.int16)
+    if guesses.shape != tricks.shape or guesses.ndim != 3:
+        raise ValueError("guesses and tricks must both be (games, rounds, players) arrays")
+    cards = np.array(ROUNDS[:guesses.shape[1]], dtype=np.int16)
+
+    played = tricks >= 0
+    hit = (guesses == tricks) & played
+    scores = np.where(played, tricks + 10 * hit, 0).astype(np.int32)
+    running = np.cumsum(scores, axis=1)
+    totals = running[:, -1, :]
+    ranks = (totals[:, None, :] > totals[:, :, None]).sum(axis=2) + 1
+
+    round_played = played.all(axis=2)
+    # The dealer bids last, so the hook is broken whenever all bids add up to the cards
+    hook = round_played & (guesses.sum(axis=2) == cards)
+    bad_tricks = round_played & (tricks.sum(axis=2) != cards)
+
+    return BatchResult(
+        scores=scores,
+        running=running,
+        totals=totals,
+        ranks=ranks,
+        hook_violations=hook,
+        trick_violations=bad_tricks,
+        rounds_played=round_played.sum(axis=1),
+    )
+
+
+def stack_games(games):
+    """Stack Game objects with the same number of players into batch arrays."""
+    import numpy as np
+
+    return (
+        np.stack([g.guesses for g in games]),
+        np.stack([g.tricks for g in games]),
+    )
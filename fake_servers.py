@@ -0,0 +1,267 @@
+"""Local stand-ins for external services, for tests and offline runs.
+
+    python fake_servers.py openai --port 8765 --latency 0.02
+    WHIST_OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run main.py
+
+    python fake_servers.py elevenlabs --port 8766
+    WHIST_ELEVENLABS_URL=http://127.0.0.1:8766 streamlit run main.py
+
+The viewer worker and whist-saver stand-ins work the same way through
+WHIST_VIEWER_URL and WHIST_SAVER_URL.
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_COMMENTARY = (
+    "And they're off! What a game of countdown whist that was. "
+    "Russell, once again, found a way to disappoint everyone at the table, "
+    "while the rest fought it out right down to the final trick. "
+    "Absolutely magnificent stuff - you couldn't script it!"
+)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Overridden per server by serve()
+    latency = 0.0
+    failure_rate = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        data = self.rfile.read(length)
+        if self.headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        return json.loads(data or b"null")
+
+    def send_body(self, status, body, content_type="application/json"):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def simulate(self):
+        """Apply the configured latency; return False if this request should fail."""
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.send_body(503, {"error": "simulated failure"})
+            return False
+        return True
+
+
+class FakeOpenAI(StandInHandler):
+    """Just enough of /v1/chat/completions to stream a canned reply."""
+
+    token_delay = 0.005
+
+    def do_POST(self):
+        if not self.simulate():
+            return
+        request = self.read_json()
+        words = FAKE_COMMENTARY.split(" ")
+        if not request.get("stream"):
+            self.send_body(200, {
+                "id": "fake", "object": "chat.completion", "created": int(time.time()), "model": request.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": FAKE_COMMENTARY}}],
+            })
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i, word in enumerate(words):
+            chunk = {
+                "id": "fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": request.get("model"),
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class FakeElevenLabs(StandInHandler):
+    """/v1/text-to-speech/<voice>/stream returning a few chunks of silent MPEG frames."""
+
+    chunks = 8
+    chunk_delay = 0.01
+    # One silent MPEG-1 layer III frame (128 kbps, 44.1 kHz)
+    frame = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+    def do_POST(self):
+        if not self.simulate():
+            return
+        self.read_json()
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.end_headers()
+        for _ in range(self.chunks):
+            self.wfile.write(self.frame * 4)
+            self.wfile.flush()
+            time.sleep(self.chunk_delay)
+
+
+class FakeViewer(StandInHandler):
+    """The gameviewer worker: POST ?game_id= stores state, GET /latest names the newest game.
+
+    Updates with a "seq" are applied as deltas to a per-game board; a gap in
+    the sequence is answered with 409 so the app resends the whole board.
+    With legacy=True it behaves like the older worker and just keeps posts.
+    """
+
+    games = None   # game_id -> list of posted payloads; set per server by serve()
+    boards = None  # game_id -> board built from seq'd updates
+    legacy = False
+    lock = threading.Lock()
+
+    def do_GET(self):
+        if not self.simulate():
+            return
+        url = urllib.parse.urlsplit(self.path)
+        with self.lock:
+            if url.path.rstrip("/") == "/latest":
+                self.send_body(200 if self.games else 404, next(reversed(self.games), ""), "text/plain")
+                return
+            game_id = urllib.parse.parse_qs(url.query).get("game_id", [""])[0]
+            board = self.boards.get(game_id)
+            posts = self.games.get(game_id)
+        if board is not None:
+            self.send_body(200, board)
+        else:
+            self.send_body(200 if posts else 404, posts[-1] if posts else {"error": "unknown game"})
+
+    def do_POST(self):
+        if not self.simulate():
+            return
+        game_id = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).get("game_id", [""])[0]
+        body = self.read_json()
+        with self.lock:
+            self.games.setdefault(game_id, []).append(body)
+            if self.legacy or "seq" not in body:
+                self.send_body(200, "OK", "text/plain")
+                return
+            status, seq = self.apply(game_id, body)
+        self.send_body(status, {"seq": seq})
+
+    def apply(self, game_id, update):
+        board = self.boards.get(game_id)
+        if board is None and update["seq"] == 1:
+            board = self.boards[game_id] = {"seq": 0, "scores_by_round": [], "guesses": {}}
+        have = board["seq"] if board else 0
+        if update["type"] == "full":
+            if update["seq"] >= have:
+                self.boards[game_id] = {key: update[key] for key in ("seq", "round_num", "dealer", "scores_by_round", "guesses")}
+            return 200, self.boards[game_id]["seq"]
+        if update["seq"] <= have:
+            return 200, have  # a retry of something already applied
+        if board is None or update["seq"] != have + 1:
+            return 409, have
+        if update["type"] == "guesses":
+            board["guesses"] = update["guesses"]
+        elif update["type"] == "round":
+            board["scores_by_round"] = board["scores_by_round"][:update["round_num"] - 1] + [update["round"]]
+            board["guesses"] = {}
+        board.update(seq=update["seq"], round_num=update["round_num"], dealer=update["dealer"])
+        return 200, board["seq"]
+
+
+class FakeSaver(StandInHandler):
+    """whist-saver: accepts score submissions, answering 207 for games it has already seen.
+
+    A body with "games" is a batch; the answer lists the games accepted
+    (new or already recorded) and rejected. legacy=True only takes one game.
+    Games in omit are left out of batch answers altogether.
+    """
+
+    seen = None  # set of game_ids; set per server by serve()
+    lock = threading.Lock()
+    legacy = False
+    omit = ()
+
+    def do_POST(self):
+        if not self.simulate():
+            return
+        body = self.read_json()
+        if "games" in body:
+            if self.legacy:
+                self.send_body(400, "missing game_id", "text/plain")
+                return
+            accepted, rejected, new = [], {}, 0
+            with self.lock:
+                for game in body["games"]:
+                    if game.get("game_id") in self.omit:
+                        continue
+                    if not game.get("scores"):
+                        rejected[game.get("game_id")] = "no scores"
+                        continue
+                    new += game["game_id"] not in self.seen
+                    self.seen.add(game["game_id"])
+                    accepted.append(game["game_id"])
+            status = 200 if new == len(body["games"]) else 207
+            self.send_body(status, {"accepted": accepted, "rejected": rejected})
+            return
+        with self.lock:
+            duplicate = body.get("game_id") in self.seen
+            self.seen.add(body.get("game_id"))
+        if duplicate:
+            self.send_body(207, f"Game {body.get('game_id')} was already recorded", "text/plain")
+        else:
+            self.send_body(200, "OK", "text/plain")
+
+
+HANDLERS = {
+    "openai": FakeOpenAI,
+    "elevenlabs": FakeElevenLabs,
+    "viewer": FakeViewer,
+    "saver": FakeSaver,
+}
+
+# Mutable state each server needs its own copy of
+_STATE_FACTORIES = {
+    "viewer": lambda: {"games": {}, "boards": {}, "lock": threading.Lock()},
+    "saver": lambda: {"seen": set(), "lock": threading.Lock()},
+}
+
+
+def serve(name, port=0, latency=0.0, failure_rate=0.0, **options):
+    """Start a stand-in on a background thread and return the server (server_port has the port)."""
+    attrs = dict(latency=latency, failure_rate=failure_rate, **options)
+    attrs.update(_STATE_FACTORIES.get(name, dict)())
+    handler = type(HANDLERS[name].__name__, (HANDLERS[name],), attrs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name=f"fake-{name}").start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service", choices=sorted(HANDLERS))
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+    server = serve(args.service, args.port, args.latency, args.failure_rate)
+    print(f"{args.service} stand-in listening on http://127.0.0.1:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
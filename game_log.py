@@ -0,0 +1,251 @@
+"""Append-only event log for one game.
+
+Everything the app knows about a game is derived from its events, kept as
+compact lists so stored records stay small:
+
+    ["g", round, [guess per seat]]    guesses submitted
+    ["r", round, [tricks per seat]]   results submitted
+    ["w", round]                      rewound to the start of a round
+    ["y"]                             redo the most recently rewound round
+
+Alongside the log a materialised view is kept up to date: completed rounds,
+running totals after every round, the guesses of the round in progress and
+a redo stack. Rewinding, redoing and reading the scores never replay the
+log. A snapshot of the view is taken every SNAPSHOT_EVERY events so a game
+can be rebuilt from its record by replaying only the tail.
+"""
+import json
+
+from engine import ROUNDS, RuleError, check_guesses, check_tricks, dealer_index, round_score, tricks_from_score
+
+SNAPSHOT_EVERY = 8
+RECORD_VERSION = 1
+
+
+class GameLog:
+    def __init__(self, game_id, player_order):
+        self.game_id = game_id
+        self.player_order = list(player_order)
+        self.events = []
+        self.snapshot = None
+        self.rounds = []      # (guesses, tricks) per completed round, in seat order
+        self.running = []     # running totals after each completed round
+        self.pending = None   # guesses for the round in progress
+        self.redo_stack = []  # (guesses, tricks or None) undone by rewinds, next redo last
+
+    # -- derived state ------------------------------------------------------
+
+    @property
+    def round_num(self):
+        return len(self.rounds)
+
+    @property
+    def awaiting_results(self):
+        return self.pending is not None
+
+    @property
+    def game_over(self):
+        return len(self.rounds) >= len(ROUNDS)
+
+    @property
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    @property
+    def totals(self):
+        last = self.running[-1] if self.running else (0,) * len(self.player_order)
+        return dict(zip(self.player_order, last))
+
+    def totals_after(self, rounds):
+        """Totals as they stood after a number of rounds (0 = before the first)."""
+        if rounds == 0:
+            return dict.fromkeys(self.player_order, 0)
+        return dict(zip(self.player_order, self.running[rounds - 1]))
+
+    def round_data(self, r):
+        guesses, tricks = self.rounds[r]
+        return {
+            p: {"guess": g, "score": round_score(g, t)}
+            for p, g, t in zip(self.player_order, guesses, tricks)
+        }
+
+    def scores_by_round(self):
+        return [self.round_data(r) for r in range(len(self.rounds))]
+
+    def to_state(self):
+        """The game keys main.py keeps in session_state."""
+        return {
+            "game_started": True,
+            "game_start_time": self.game_id,
+            "round_num": self.round_num,
+            "player_order": list(self.player_order),
+            "scores": self.totals,
+            "scores_by_round": self.scores_by_round(),
+            "guesses": dict(zip(self.player_order, self.pending)) if self.pending else {},
+            "awaiting_results": self.awaiting_results,
+            "game_over": self.game_over,
+        }
+
+    # -- commands -----------------------------------------------------------
+
+    def submit_guesses(self, guesses, check=True):
+        if self.game_over:
+            raise RuleError("game is already over")
+        if check:
+            check_guesses(self.player_order, self.round_num, guesses)
+        self._append(["g", self.round_num, [int(guesses[p]) for p in self.player_order]])
+
+    def submit_results(self, tricks, check=True):
+        if self.pending is None:
+            raise RuleError("guesses must be submitted before results")
+        if check:
+            check_tricks(self.player_order, self.round_num, tricks)
+        self._append(["r", self.round_num, [int(tricks.get(p, 0)) for p in self.player_order]])
+
+    def rewind(self, to_round):
+        if not 0 <= to_round <= self.round_num:
+            raise RuleError(f"can't rewind to round {to_round + 1}")
+        if to_round == self.round_num and self.pending is None:
+            return
+        self._append(["w", to_round])
+
+    def redo(self):
+        if not self.redo_stack:
+            raise RuleError("nothing to redo")
+        self._append(["y"])
+
+    # -- event application --------------------------------------------------
+
+    def _append(self, event):
+        self._apply(event)
+        self.events.append(event)
+        if len(self.events) % SNAPSHOT_EVERY == 0:
+            self.snapshot = self._view()
+
+    def _apply(self, event):
+        kind = event[0]
+        if kind == "g":
+            self.pending = tuple(event[2])
+            self.redo_stack.clear()
+        elif kind == "r":
+            self._complete(self.pending, tuple(event[2]))
+            self.redo_stack.clear()
+        elif kind == "w":
+            to_round = event[1]
+            if self.pending is not None:
+                self.redo_stack.append((self.pending, None))
+                self.pending = None
+            while len(self.rounds) > to_round:
+                self.redo_stack.append(self.rounds.pop())
+                self.running.pop()
+        elif kind == "y":
+            guesses, tricks = self.redo_stack.pop()
+            if tricks is None:
+                self.pending = guesses
+            else:
+                self._complete(guesses, tricks)
+        else:
+            raise ValueError(f"unknown game event {event!r}")
+
+    def _complete(self, guesses, tricks):
+        prev = self.running[-1] if self.running else (0,) * len(self.player_order)
+        self.rounds.append((guesses, tricks))
+        self.running.append(tuple(total + round_score(g, t) for total, g, t in zip(prev, guesses, tricks)))
+        self.pending = None
+
+    # -- outbound payloads --------------------------------------------------
+    # Viewer updates carry a sequence number, the event's position in the log.
+    # Guesses and completed rounds go out as small deltas; anything else
+    # (rewinds, redos, and resyncs the viewer asks for) sends the whole board.
+
+    @property
+    def viewer_seq(self):
+        return len(self.events)
+
+    def _viewer_header(self, kind):
+        return {
+            "seq": self.viewer_seq,
+            "type": kind,
+            "round_num": self.round_num,
+            "dealer": self.player_order[dealer_index(self.round_num, len(self.player_order))],
+        }
+
+    def viewer_snapshot(self):
+        return dict(
+            self._viewer_header("full"),
+            scores_by_round=self.scores_by_round(),
+            guesses=dict(zip(self.player_order, self.pending or ())),
+        )
+
+    def viewer_delta(self):
+        """The viewer update for the latest event."""
+        kind = self.events[-1][0] if self.events else None
+        if kind == "g":
+            return dict(self._viewer_header("guesses"), guesses=dict(zip(self.player_order, self.pending)))
+        if kind == "r":
+            return dict(self._viewer_header("round"), round=self.round_data(self.round_num - 1))
+        return self.viewer_snapshot()
+
+    def sheet_scores(self):
+        return [{"Player": p, "Score": int(score)} for p, score in self.totals.items()]
+
+    # -- persistence --------------------------------------------------------
+
+    def _view(self):
+        return {
+            "n": len(self.events),
+            "rounds": [[list(g), list(t)] for g, t in self.rounds],
+            "pending": list(self.pending) if self.pending is not None else None,
+            "redo": [[list(g), list(t) if t is not None else None] for g, t in self.redo_stack],
+        }
+
+    def _load_view(self, view):
+        for guesses, tricks in view["rounds"]:
+            self._complete(tuple(guesses), tuple(tricks))
+        self.pending = tuple(view["pending"]) if view["pending"] is not None else None
+        self.redo_stack = [(tuple(g), tuple(t) if t is not None else None) for g, t in view["redo"]]
+
+    def to_record(self):
+        return json.dumps({
+            "v": RECORD_VERSION,
+            "id": self.game_id,
+            "players": self.player_order,
+            "events": self.events,
+            "snap": self.snapshot,
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_record(cls, record):
+        data = json.loads(record)
+        if data.get("v") != RECORD_VERSION:
+            raise ValueError(f"unsupported game record version {data.get('v')}")
+        log = cls(data["id"], data["players"])
+        log.events = data["events"]
+        log.snapshot = data["snap"]
+        start = 0
+        if log.snapshot:
+            log._load_view(log.snapshot)
+            start = log.snapshot["n"]
+        for event in log.events[start:]:
+            log._apply(event)
+        return log
+
+    @classmethod
+    def replay(cls, game_id, player_order, events):
+        """Rebuild a game from scratch by applying every event."""
+        log = cls(game_id, player_order)
+        for event in events:
+            log._append(event)
+        return log
+
+    @classmethod
+    def from_state(cls, state):
+        """Build a log from a state dict, e.g. a legacy whist_state cookie."""
+        log = cls(state.get("game_start_time"), state["player_order"])
+        for round_data in state.get("scores_by_round") or []:
+            log._append(["g", log.round_num, [round_data[p]["guess"] for p in log.player_order]])
+            log._append(["r", log.round_num, [tricks_from_score(round_data[p]["score"]) for p in log.player_order]])
+        guesses = state.get("guesses") or {}
+        if state.get("awaiting_results") and all(p in guesses for p in log.player_order):
+            log._append(["g", log.round_num, [guesses[p] for p in log.player_order]])
+        return log
@@ -0,0 +1,155 @@
+"""Server-side store of every game this process is hosting, keyed by game_id.
+
+Records are each game's compact GameLog record, so a game costs well
+under a kilobyte. Every save is also written to disk; games nobody has
+touched for a while (or the least recently used beyond max_resident) are
+dropped from memory and read back from disk on demand.
+
+game_ids are public (they're in the viewer link), so each game also has
+an unguessable join token. A device needs it, from its cookie or a join
+link, to open the game and keep score.
+"""
+import hashlib
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from game_log import GameLog
+
+STORE_DIR = os.environ.get("WHIST_GAME_DIR", os.path.join(".whist", "games"))
+IDLE_SECONDS = 30 * 60
+MAX_RESIDENT = 1000
+EVICT_EVERY = 60
+
+
+class VersionConflict(Exception):
+    """A save based on an older version of the game than the store holds."""
+
+
+class GameStore:
+    def __init__(self, directory=STORE_DIR, idle_seconds=IDLE_SECONDS, max_resident=MAX_RESIDENT):
+        self.directory = directory
+        self.idle_seconds = idle_seconds
+        self.max_resident = max_resident
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._games = OrderedDict()  # game_id -> [record, version, last_used, join token]
+        self._last_evict = time.monotonic()
+
+    def _path(self, game_id):
+        return os.path.join(self.directory, hashlib.sha1(game_id.encode("utf-8")).hexdigest() + ".json")
+
+    def _load(self, game_id):
+        entry = self._games.get(game_id)
+        if entry is None:
+            try:
+                with open(self._path(game_id), encoding="utf-8") as f:
+                    saved = json.load(f)
+            except FileNotFoundError:
+                return None
+            entry = self._games[game_id] = [saved["record"], saved["version"], 0, saved.get("join")]
+        entry[2] = time.monotonic()
+        self._games.move_to_end(game_id)
+        return entry
+
+    def _write(self, game_id, record, version, token):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"game_id": game_id, "version": version, "record": record, "join": token}, f)
+        os.replace(tmp, self._path(game_id))
+
+    def version(self, game_id):
+        """Current version of a game, or None if it doesn't exist. Cheap enough for every rerun."""
+        with self._lock:
+            entry = self._load(game_id)
+            return entry[1] if entry else None
+
+    def get(self, game_id):
+        """(GameLog, version) for a game, or (None, None)."""
+        with self._lock:
+            entry = self._load(game_id)
+            if entry is None:
+                return None, None
+            record, version = entry[0], entry[1]
+        return GameLog.from_record(record), version
+
+    def put(self, game_id, log, base_version=None):
+        """Save a game's log and return its new version.
+
+        base_version is the version the log was loaded at (None for a new
+        game). If another device has saved since, VersionConflict is raised
+        rather than writing over its changes.
+        """
+        record = log.to_record()
+        with self._lock:
+            entry = self._load(game_id)
+            version = entry[1] + 1 if entry else 1
+            if entry is not None and entry[0] != record and entry[1] != base_version:
+                raise VersionConflict(f"game {game_id} is at version {entry[1]}, not {base_version}")
+            if entry is None or entry[0] != record:
+                token = entry[3] if entry and entry[3] else secrets.token_urlsafe(16)
+                self._write(game_id, record, version, token)
+                self._games[game_id] = [record, version, time.monotonic(), token]
+            else:
+                version = entry[1]
+            self._maybe_evict()
+        return version
+
+    def join_token(self, game_id):
+        """The game's join token (games saved before tokens get one now), or None if it doesn't exist."""
+        with self._lock:
+            entry = self._load(game_id)
+            if entry is None:
+                return None
+            if not entry[3]:
+                entry[3] = secrets.token_urlsafe(16)
+                self._write(game_id, entry[0], entry[1], entry[3])
+            return entry[3]
+
+    def can_join(self, game_id, token):
+        """Whether a token opens a game. Games saved before tokens open without one until they get one."""
+        with self._lock:
+            entry = self._load(game_id)
+        if entry is None:
+            return False
+        if not entry[3]:
+            return token is None
+        return secrets.compare_digest(entry[3], token or "")
+
+    def __contains__(self, game_id):
+        return self.version(game_id) is not None
+
+    def __len__(self):
+        return len(self._games)
+
+    def _maybe_evict(self):
+        now = time.monotonic()
+        if len(self._games) > self.max_resident or now - self._last_evict > EVICT_EVERY:
+            self.evict_idle(now)
+
+    def evict_idle(self, now=None):
+        """Drop idle games from memory; they're already on disk."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._last_evict = now
+            for game_id in [g for g, e in self._games.items() if now - e[2] > self.idle_seconds]:
+                del self._games[game_id]
+            while len(self._games) > self.max_resident:
+                self._games.popitem(last=False)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide store shared by every Streamlit session."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = GameStore()
+        return _store
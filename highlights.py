@@ -0,0 +1,115 @@
+"""Match highlights worked out from scores_by_round, for the commentary prompt.
+
+The players in each round's dict are in seat order, as GameLog writes
+them, which is what the dealer and hook calculations rely on.
+"""
+from engine import ROUNDS, dealer_index, hook_value, rank, trump_for_round, tricks_from_score
+
+
+def _leaders(totals):
+    best = max(totals.values())
+    return [p for p, total in totals.items() if total == best]
+
+
+def _streaks(hits, players):
+    """Longest run of hit and of missed bids per player, as (length, first round, last round)."""
+    best = {}
+    for player in players:
+        for want in (True, False):
+            run, longest = 0, (0, None, None)
+            for r, row in enumerate(hits):
+                run = run + 1 if row[player] == want else 0
+                if run > longest[0]:
+                    longest = (run, r - run + 1, r)
+            best[player, want] = longest
+    return best
+
+
+def extract(scores_by_round):
+    """The story of a game, as plain data."""
+    players = list(scores_by_round[0])
+    n = len(players)
+    totals = dict.fromkeys(players, 0)
+    hits, lead_changes, ties, swings, hooked = [], [], [], [], []
+    leaders = None
+
+    for r, round_data in enumerate(scores_by_round):
+        scores = {p: round_data[p]["score"] for p in players}
+        for p in players:
+            totals[p] += scores[p]
+        hits.append({p: scores[p] >= 10 for p in players})
+
+        now = _leaders(totals)
+        if now != leaders:
+            lead_changes.append((r, now, totals[now[0]]))
+        leaders = now
+        if len(now) > 1:
+            ties.append((r, now, totals[now[0]]))
+
+        for p in players:
+            others = [scores[q] for q in players if q != p]
+            swings.append((scores[p] - sum(others) / len(others), r, p, scores[p]))
+
+        # The dealer bids last and can't make the bids add up to the cards
+        cards = ROUNDS[r] if r < len(ROUNDS) else None
+        dealer = players[dealer_index(r, n)]
+        if cards is not None:
+            earlier = [round_data[p]["guess"] for p in players if p != dealer]
+            banned = hook_value(cards, earlier)
+            took = tricks_from_score(scores[dealer])
+            if banned >= 0 and took == banned and not hits[-1][dealer]:
+                hooked.append((r, dealer, banned))
+
+    standings = rank(totals)
+    winners = [p for position, p, _ in standings if position == 1]
+    runner_up = next((score for position, _, score in standings if position > 1), None)
+    swings.sort(reverse=True)
+    return {
+        "players": players,
+        "rounds": len(scores_by_round),
+        "standings": standings,
+        "winners": winners,
+        "margin": totals[winners[0]] - runner_up if runner_up is not None and len(winners) == 1 else 0,
+        "hit_counts": {p: sum(row[p] for row in hits) for p in players},
+        "lead_changes": lead_changes,
+        "ties": ties,
+        "streaks": _streaks(hits, players),
+        "swings": swings[:3],
+        "hooked": hooked,
+    }
+
+
+def digest(scores_by_round):
+    """A compact text summary of the game for the model to narrate."""
+    if not scores_by_round:
+        return "No rounds played."
+    h = extract(scores_by_round)
+    players, rounds = h["players"], h["rounds"]
+    names = lambda ps: " & ".join(ps)
+    lines = [
+        f"Players in seat order: {', '.join(players)}. {rounds} rounds played (cards 7 down to 1 and back up to 7).",
+        "Final: " + ", ".join(f"{position}. {p} {score}" for position, p, score in h["standings"]),
+        f"Winner: {names(h['winners'])}" + (f" by {h['margin']}" if h["margin"] else " (tied)"),
+        "Bids hit: " + ", ".join(f"{p} {h['hit_counts'][p]}/{rounds}" for p in players),
+        "Lead changes: " + "; ".join(f"R{r + 1} {names(ps)} ({total})" for r, ps, total in h["lead_changes"]),
+    ]
+    if h["ties"]:
+        lines.append("Level at the top: " + "; ".join(f"after R{r + 1} {names(ps)} on {total}" for r, ps, total in h["ties"]))
+    streaks = []
+    for p in players:
+        for want, word in ((True, "hit"), (False, "missed")):
+            length, first, last = h["streaks"][p, want]
+            if length >= 3:
+                streaks.append(f"{p} {word} {length} in a row (R{first + 1}-R{last + 1})")
+    if streaks:
+        lines.append("Streaks: " + "; ".join(streaks))
+    lines.append("Biggest rounds: " + "; ".join(f"R{r + 1} {p} scored {score}" for _, r, p, score in h["swings"]))
+    if h["hooked"]:
+        lines.append("Hooked (dealer barred from a bid, then took exactly that many): " + "; ".join(
+            f"R{r + 1} {p} (barred {banned})" for r, p, banned in h["hooked"]))
+    lines.append("Rounds as bid/score per player in seat order:")
+    for r, round_data in enumerate(scores_by_round):
+        trump = trump_for_round(r)
+        shape = f"{ROUNDS[r]} {'NT' if trump.startswith('No') else trump.split()[0]}" if r < len(ROUNDS) else ""
+        lines.append(f"R{r + 1} {shape}: " + " ".join(f"{round_data[p]['guess']}/{round_data[p]['score']}" for p in players))
+    return "\n".join(lines)
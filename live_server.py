@@ -0,0 +1,255 @@
+"""Optional live scoreboard served from the app's own process.
+
+Set WHIST_LIVE_PORT and spectators can follow a game at
+/games/<game_id> on that port, without going through the viewer worker.
+The page gets its updates over Server-Sent Events from /games/<game_id>/events.
+These are the same sequence-numbered updates the worker is sent (see
+GameLog.viewer_delta). Every update is encoded once and handed to each
+connected spectator's queue as-is.
+
+    /games/<game_id>          scoreboard page
+    /games/<game_id>/board    the current board as JSON
+    /games/<game_id>/events   text/event-stream of updates, starting with the whole board
+"""
+import json
+import os
+import queue
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PORT = int(os.environ.get("WHIST_LIVE_PORT") or 0)
+HOST = os.environ.get("WHIST_LIVE_HOST", "0.0.0.0")
+PUBLIC_URL = os.environ.get("WHIST_LIVE_PUBLIC_URL", "").rstrip("/")
+HEARTBEAT_SECONDS = 15
+QUEUE_SIZE = 64
+
+
+def sse_message(update):
+    return (
+        f"id: {update['seq']}\nevent: {update['type']}\n"
+        f"data: {json.dumps(update, separators=(',', ':'))}\n\n"
+    ).encode("utf-8")
+
+
+class Hub:
+    """Latest board per game and the queues of everyone watching it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watchers = {}  # game_id -> set of queues
+        self._boards = {}    # game_id -> latest snapshot
+
+    def publish(self, game_id, delta, snapshot):
+        message = sse_message(delta)
+        with self._lock:
+            self._boards[game_id] = snapshot
+            watchers = list(self._watchers.get(game_id, ()))
+        for q in watchers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # Too far behind to catch up with deltas; it reconnects and gets the board
+                self.unsubscribe(game_id, q)
+                q.queue.clear()
+                q.put_nowait(None)
+
+    def subscribe(self, game_id):
+        q = queue.Queue(QUEUE_SIZE)
+        with self._lock:
+            self._watchers.setdefault(game_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, game_id, q):
+        with self._lock:
+            watchers = self._watchers.get(game_id)
+            if watchers is not None:
+                watchers.discard(q)
+                if not watchers:
+                    del self._watchers[game_id]
+
+    def watchers(self, game_id):
+        with self._lock:
+            return len(self._watchers.get(game_id, ()))
+
+    def board(self, game_id):
+        with self._lock:
+            board = self._boards.get(game_id)
+        if board is None:
+            # Nothing published since this process started; the store has the game
+            from game_store import get_store
+
+            log, _ = get_store().get(game_id)
+            board = log.viewer_snapshot() if log is not None else None
+        return board
+
+
+class LiveHandler(BaseHTTPRequestHandler):
+    hub = None  # set by LiveServer
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        parts = [urllib.parse.unquote(p) for p in urllib.parse.urlsplit(self.path).path.split("/") if p]
+        if len(parts) < 2 or parts[0] != "games":
+            self.send_text(404, "Not found")
+            return
+        game_id, view = parts[1], (parts[2] if len(parts) > 2 else "")
+        if view == "events":
+            self.stream(game_id)
+            return
+        board = self.hub.board(game_id)
+        if board is None:
+            self.send_text(404, "Unknown game")
+        elif view == "board":
+            self.send_text(200, json.dumps(board), "application/json")
+        elif view == "":
+            self.send_text(200, PAGE, "text/html; charset=utf-8")
+        else:
+            self.send_text(404, "Not found")
+
+    def send_text(self, status, text, content_type="text/plain; charset=utf-8"):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream(self, game_id):
+        q = self.hub.subscribe(game_id)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            board = self.hub.board(game_id)
+            if board is not None:
+                self.wfile.write(sse_message(board))
+            self.wfile.flush()
+            while True:
+                try:
+                    message = q.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    message = b": ping\n\n"
+                if message is None:
+                    return
+                self.wfile.write(message)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.hub.unsubscribe(game_id, q)
+
+
+class LiveServer:
+    def __init__(self, host=HOST, port=PORT, hub=None):
+        self.hub = hub or Hub()
+        handler = type("LiveHandler", (LiveHandler,), {"hub": self.hub})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_port
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="live-scoreboard").start()
+
+    def url(self, game_id):
+        base = PUBLIC_URL or f"http://localhost:{self.port}"
+        return f"{base}/games/{urllib.parse.quote(str(game_id), safe='')}"
+
+    def publish(self, game_id, delta, snapshot):
+        self.hub.publish(game_id, delta, snapshot)
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+_live = None
+_live_lock = threading.Lock()
+
+
+def get_live_server():
+    """Process-wide server, started on first use (None unless WHIST_LIVE_PORT is set)."""
+    global _live
+    if not PORT:
+        return None
+    with _live_lock:
+        if _live is None:
+            _live = LiveServer()
+        return _live
+
+
+PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Whist - live scores</title>
+<style>
+body { font-family: sans-serif; margin: 1rem; }
+table { border-collapse: collapse; }
+th, td { padding: 0.25rem 0.6rem; text-align: right; border-bottom: 1px solid #ddd; }
+tfoot td { font-weight: bold; }
+#status { color: gray; font-size: 0.8rem; }
+</style></head>
+<body>
+<h2 id="title">Whist</h2>
+<table><thead id="head"></thead><tbody id="rounds"></tbody><tfoot id="totals"></tfoot></table>
+<p id="guesses"></p>
+<p id="status">connecting...</p>
+<script>
+const base = location.pathname.replace(/\\/$/, "");
+let board = null;
+
+// Names and scores come from client-held state, so cells are only ever set as text
+function row(tag, cells) {
+  const tr = document.createElement("tr");
+  cells.forEach(text => {
+    const cell = document.createElement(tag);
+    cell.textContent = text;
+    tr.appendChild(cell);
+  });
+  return tr;
+}
+
+function render() {
+  const players = Object.keys(board.scores_by_round[0] || board.guesses || {});
+  document.getElementById("title").textContent = `Round ${board.round_num + 1} - ${board.dealer} to deal`;
+  document.getElementById("head").replaceChildren(row("th", ["Round", ...players]));
+  const totals = Object.fromEntries(players.map(p => [p, 0]));
+  document.getElementById("rounds").replaceChildren(...board.scores_by_round.map((round, i) => {
+    players.forEach(p => totals[p] += round[p].score);
+    return row("td", [i + 1, ...players.map(p => `${round[p].score} (${round[p].guess})`)]);
+  }));
+  document.getElementById("totals").replaceChildren(row("td", ["Total", ...players.map(p => totals[p])]));
+  const guesses = Object.entries(board.guesses || {});
+  document.getElementById("guesses").textContent = guesses.length
+    ? "Guesses: " + guesses.map(([p, g]) => `${p} ${g}`).join(", ") : "";
+}
+
+async function resync() {
+  board = await (await fetch(base + "/board")).json();
+  render();
+}
+
+function apply(update) {
+  if (update.type === "full") {
+    board = update;
+  } else if (!board || update.seq !== board.seq + 1) {
+    return resync();
+  } else if (update.type === "guesses") {
+    board.guesses = update.guesses;
+  } else if (update.type === "round") {
+    board.scores_by_round = board.scores_by_round.slice(0, update.round_num - 1).concat([update.round]);
+    board.guesses = {};
+  }
+  Object.assign(board, {seq: update.seq, round_num: update.round_num, dealer: update.dealer});
+  render();
+}
+
+const events = new EventSource(base + "/events");
+["full", "guesses", "round"].forEach(type => events.addEventListener(type, e => apply(JSON.parse(e.data))));
+events.onopen = () => document.getElementById("status").textContent = "live";
+events.onerror = () => document.getElementById("status").textContent = "reconnecting...";
+</script>
+</body></html>
+"""
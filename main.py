@@ -1,33 +1,237 @@
 import streamlit as st
-import pandas as pd
 from streamlit_cookies_controller import CookieController
-import json
-import time
-import zlib, base64
-import openai
-import requests
+import functools
+import itertools
+import hashlib
+import os
+import sys
 from datetime import datetime
 import urllib.parse
 
+from state_codec import encode_state, decode_state, game_ref, game_ref_token, parse_game_ref, CLEARED
+from game_store import VersionConflict, get_store
+from game_log import GameLog
+from scoreboard import Scoreboard
+from engine import PLAYERS, ROUNDS, trump_for_round, dealer_index, bidding_order, hook_value
+import tracing
 
 
+COOKIE_KEY = "whist_state"
+COOKIE_MAX_AGE = 30 * 24 * 60 * 60
+COOKIE_ACK_ATTEMPTS = 3
+TRACE_KEEP = 10
+TITLE = "Whist Scorekeeper :material/playing_cards:"
+LIVE_SCOREBOARD = bool(os.environ.get("WHIST_LIVE_PORT"))
+GAME_KEYS = (
+    "game_started", "game_start_time", "round_num", "player_order", "scores",
+    "scores_by_round", "guesses", "awaiting_results", "game_over",
+)
+
+
+def finish_trace(status):
+    # Keep the last few runs for the Performance expander; WHIST_TRACE turns this on
+    run = st.session_state.pop("trace_run", None)
+    if run is not None:
+        tracing.end(run, status)
+        st.session_state.setdefault("trace_runs", []).append(run)
+        del st.session_state.trace_runs[:-TRACE_KEEP]
+
+
+def start_trace(label):
+    # A run cut short by st.stop() or st.rerun() is closed when the next one starts
+    finish_trace("interrupted")
+    if tracing.ENABLED:
+        st.session_state.trace_run = tracing.begin(label)
+
+
+def traced_fragment(func):
+    # A fragment rerun skips the top of the script, so it gets a run of its own
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        own = tracing.ENABLED and "trace_run" not in st.session_state
+        if own:
+            start_trace(func.__name__)
+        result = func(*args, **kwargs)
+        if own:
+            finish_trace("ok")
+        return result
+    return wrapper
+
 
-PLAYERS = ["Campbell", "Russell", "Nathan", "Dave"]
-SUITS = ["Hearts ♥️", "Spades ♠️", "Diamonds ♦️", "Clubs ♣️", "No Trumps 🙅🏻"]
-ROUNDS = list(range(7, 0, -1)) + list(range(2, 8))  # 7 to 1, then 2 to 7
+start_trace("rerun")
+tracing.phase("cookies")
+
+
+def sync_outbox():
+    # requests (and the delivery threads) only load once something needs sending
+    from outbox import get_outbox
+    return get_outbox()
 
 
 # Init cookie controller
 controller = CookieController()
 cookies = controller.getAll()
 
-# Abort if not ready
-if not cookies:
-    st.stop()
+_cookie_sent = set()
 
 
+def cookie_acknowledged(value):
+    # Read the cookie back through a throwaway controller; seeing our value is the ack
+    digest = hashlib.sha1(value.encode("utf-8")).hexdigest()[:12]
+    attempt = st.session_state.get("cookie_ack_attempt", 0)
+    if attempt >= COOKIE_ACK_ATTEMPTS:
+        return False
+    ack_key = f"cookie_ack_{digest}_{attempt}"
+    asked_before = ack_key in st.session_state
+    echo = CookieController(key=ack_key).getAll() or {}
+    if echo.get(COOKIE_KEY) == value:
+        return True
+    if asked_before:
+        st.session_state.cookie_ack_attempt = attempt + 1
+    return False
+
+
+def send_pending_cookie():
+    # The write is re-sent on every run until the browser acknowledges it,
+    # so an st.rerun() straight after saving can't drop it
+    value = st.session_state.get("cookie_pending")
+    if value is None or value in _cookie_sent:
+        return
+    _cookie_sent.add(value)
+    with tracing.span("cookie_write", bytes=len(value)):
+        controller.set(COOKIE_KEY, value, max_age=COOKIE_MAX_AGE)
+    if cookie_acknowledged(value):
+        del st.session_state["cookie_pending"]
+
+
+def write_cookie(value):
+    if "cookie_pending" not in st.session_state and cookies.get(COOKIE_KEY) == value:
+        return
+    if st.session_state.get("cookie_pending") != value:
+        st.session_state.cookie_pending = value
+        st.session_state.cookie_ack_attempt = 0
+    send_pending_cookie()
+
+
+send_pending_cookie()
+
+
+def cookie_digest(raw):
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def decode_cookie(raw):
+    # Shared by every session, so a given cookie is only parsed once per process;
+    # each hit hands back its own copy
+    return decode_state(raw) or {}
+
+
+def get_scoreboard():
+    players = st.session_state.get("player_order") or PLAYERS
+    if "scoreboard" not in st.session_state or st.session_state.scoreboard.players != players:
+        st.session_state.scoreboard = Scoreboard(players)
+    return st.session_state.scoreboard
+
+
+def current_log():
+    # Games restored from an old full-state cookie get a log rebuilt from that state
+    log = st.session_state.get("game_log")
+    if log is None or log.game_id != st.session_state.get("game_start_time"):
+        log = GameLog.from_state({key: st.session_state.get(key) for key in GAME_KEYS})
+        st.session_state.game_log = log
+    return log
+
+
+def apply_log(log):
+    # The log is the source of truth; session_state just mirrors it for the UI
+    st.session_state.game_log = log
+    for key, val in log.to_state().items():
+        st.session_state[key] = val
+    get_scoreboard().sync(st.session_state.scores_by_round)
 
-COOKIE_KEY = "whist_state"
+
+def live_server():
+    # The in-process scoreboard only loads when WHIST_LIVE_PORT asks for it
+    if not LIVE_SCOREBOARD:
+        return None
+    from live_server import get_live_server
+    return get_live_server()
+
+
+def archive_game(log):
+    # Finished games are kept round by round for the History tab, and rated
+    try:
+        from archive import get_archive
+        from ratings import get_ratings
+
+        archive, ratings = get_archive(), get_ratings()
+        if archive.add(log):
+            if len(ratings) == len(archive) - 1:
+                ratings.record(log.game_id, log.totals)
+            else:
+                # Ratings file lost or older than the archive: replay every game
+                ratings.recompute_from_archive(archive)
+    except Exception as e:
+        st.warning(f"Couldn't archive this game: {e}")
+    try:
+        # Waits for the next sheet submission, even if this game's own submit never happens
+        sync_outbox().queue_scores(log.game_id, log.sheet_scores())
+    except Exception as e:
+        st.warning(f"Couldn't queue this game for the sheet: {e}")
+
+
+def prefetch_summaries(log):
+    # Start writing every commentary style (and the audio, if asked) while the players look at the board
+    if not st.session_state.get("openai_key"):
+        return
+    from prefetch import get_prefetcher
+
+    elevenlabs_key = st.session_state.get("elevenlabs_key") if st.session_state.get("prefetch_audio") else None
+    get_prefetcher().start(log.game_id, st.session_state.scores_by_round, st.session_state.openai_key, elevenlabs_key)
+
+
+def running_prefetcher():
+    # Nothing can be in flight if prefetch was never imported, so don't pay for the import
+    return sys.modules["prefetch"].get_prefetcher() if "prefetch" in sys.modules else None
+
+
+def cancel_prefetch(game_id):
+    prefetcher = running_prefetcher()
+    if game_id and prefetcher is not None:
+        prefetcher.cancel(game_id)
+
+
+def pending_summary(kind, style):
+    # The prefetch task for this game's commentary or audio, if there is one
+    prefetcher = running_prefetcher()
+    if prefetcher is None:
+        return None
+    return prefetcher.task(st.session_state.get("game_start_time"), kind, style)
+
+
+def update_viewer(log, full=False):
+    # Sent in the background: a small delta for guesses and results, the whole board otherwise
+    snapshot = log.viewer_snapshot()
+    delta = snapshot if full else log.viewer_delta()
+    live = live_server()
+    if live is not None:
+        live.publish(log.game_id, delta, snapshot)
+    try:
+        sync_outbox().sync_viewer(log.game_id, delta, snapshot)
+    except Exception as e:
+        st.warning(f"Failed to queue viewer update: {e}")
+
+
+tracing.phase("sidebar")
+
+# The cookie component reports on its first round trip and reruns the script when it does.
+# Until then paint the Game tab's frame rather than a blank page; the game fills in on that rerun.
+if not cookies:
+    st.title(TITLE)
+    st.caption("Loading your game…")
+    finish_trace("skeleton")
+    st.stop()
 
 if "confirm_new" not in st.session_state:
     st.session_state.confirm_new = False
@@ -37,22 +241,18 @@ if "game_start_time" not in st.session_state:
 
 
 def start_fresh():
-    # only try removal if it actually exists
-    try:
-        current = controller.getAll()
-        if COOKIE_KEY in current:
-            controller.remove(COOKIE_KEY)
-    except Exception as e:
-        st.sidebar.error(f"Error removing cookie: {e}")
+    cancel_prefetch(st.session_state.get("game_start_time"))
     # clear all session_state
     for k in list(st.session_state.keys()):
         del st.session_state[k]
+    # Overwrite rather than remove the cookie so the write can be acknowledged
+    st.session_state.cookie_pending = CLEARED
+    st.session_state.cookie_ack_attempt = 0
     st.session_state.tab = "Game"
     st.session_state.rerun_pending = True
-    time.sleep(0.5)# defer rerun
 
 def prompt_abandon():
-    if COOKIE_KEY in cookies and not st.session_state.get("game_over", False):
+    if st.session_state.get("game_started") and not st.session_state.get("game_over", False):
         st.session_state.confirm_new = True
     else:
         if st.session_state.get("game_over") and not st.session_state.get("scores_submitted"):
@@ -74,17 +274,33 @@ if st.session_state.get("game_started") and not st.session_state.get("game_over"
     round_label = f"Replay Round {current}" if current > 0 else "Replay Round"
     if col2.button(round_label):
         if current > 0:
-            st.session_state.round_num = current - 1
-            st.session_state.awaiting_results = False
-            st.session_state.guesses = {}
+            log = current_log()
+            log.rewind(current - 1)
+            apply_log(log)
+            update_viewer(log)
             st.session_state.tricks_won = {}
-            if "scores_by_round" in st.session_state and len(st.session_state.scores_by_round) >= current:
-                for player in st.session_state.player_order:
-                    st.session_state.scores[player] -= st.session_state.scores_by_round[current - 1][player]["score"]
-                st.session_state.scores_by_round = st.session_state.scores_by_round[:current - 1]
             st.session_state.save_cookie = True
             st.rerun()
 
+    log = current_log()
+    if log.can_redo and st.sidebar.button(f"Redo Round {current + 1}"):
+        log.redo()
+        apply_log(log)
+        update_viewer(log)
+        st.session_state.save_cookie = True
+        st.rerun()
+
+    if current > 1:
+        with st.sidebar.expander("⏪ Rewind to an earlier round"):
+            target = st.selectbox("Round", list(range(1, current + 1)), index=current - 1)
+            if st.button(f"Rewind to Round {target}"):
+                log.rewind(target - 1)
+                apply_log(log)
+                update_viewer(log)
+                st.session_state.tricks_won = {}
+                st.session_state.save_cookie = True
+                st.rerun()
+
 # Confirmation UI
 if st.session_state.confirm_new:
     st.sidebar.warning("Are you sure you want to abandon the current game?")
@@ -94,19 +310,68 @@ if st.session_state.confirm_new:
 
 
 
-# Restore from cookie
-if COOKIE_KEY in cookies:
+tracing.phase("restore")
+
+# Restore from cookie (an unacknowledged write is newer than what the browser sent).
+# The cookie normally just names a game in the server-side store; older cookies hold the whole state.
+store = get_store()
+raw = st.session_state.get("cookie_pending", cookies.get(COOKIE_KEY))
+
+
+def new_game_id():
+    game_id = datetime.utcnow().isoformat(timespec="milliseconds")
+    while game_id in store:
+        game_id = datetime.utcnow().isoformat(timespec="milliseconds")
+    return game_id
+
+
+joined, join_key = st.query_params.get("game"), st.query_params.get("key")
+if joined and join_key and joined != parse_game_ref(raw) and store.can_join(joined, join_key):
+    # Opened from another device's game link
+    for key in GAME_KEYS + ("store_version", "store_game"):
+        st.session_state.pop(key, None)
+    raw = game_ref(joined, join_key)
+    write_cookie(raw)
+for param in ("game", "key"):
+    if param in st.query_params:
+        del st.query_params[param]
+
+if raw is not None:
     try:
-        raw = cookies[COOKIE_KEY]
-        if isinstance(raw, str):
-            try:
-                decoded = base64.b64decode(raw)
-                txt = zlib.decompress(decoded).decode('utf-8')
-            except Exception:
-                txt = raw
-        saved = json.loads(txt)
+        shared_id = parse_game_ref(raw)
+        if shared_id is not None and store.can_join(shared_id, game_ref_token(raw)):
+            st.session_state.store_game = shared_id
+        refresh = False
+        if shared_id is None and not isinstance(raw, str):
+            saved = decode_state(raw) or {}
+        elif shared_id is None:
+            # A full-state cookie is only copied in once per session while it stays the same
+            digest = cookie_digest(raw)
+            if st.session_state.get("restored_cookie") != digest:
+                saved = decode_cookie(raw)
+                st.session_state.restored_cookie = digest
+            else:
+                saved = {}
+        elif st.session_state.get("store_game") != shared_id:
+            # A reference without this game's join token (the game_id alone is public)
+            saved = {}
+        elif store.version(shared_id) != st.session_state.get("store_version"):
+            # First load here, or another device has saved since we last looked
+            log, version = store.get(shared_id)
+            if log is not None:
+                saved = dict(log.to_state(), game_log=log, store_version=version)
+                refresh = True
+            else:
+                saved = {}
+        else:
+            saved = {}
+        if not refresh and saved.get("game_start_time") and saved["game_start_time"] in store:
+            # A full-state cookie can't take over a hosted game without its token; it plays on as a copy
+            saved = dict(saved, game_start_time=new_game_id())
         for key, val in saved.items():
-            if key == "game_start_time":
+            if refresh:
+                st.session_state[key] = val
+            elif key == "game_start_time":
                 if st.session_state.get(key) is None:
                     st.session_state[key] = val
             elif key not in st.session_state:
@@ -118,22 +383,52 @@ if COOKIE_KEY in cookies:
 
 
 
+@st.cache_data(max_entries=16, show_spinner=False)
+def scores_table(game_id, rounds_played, digest, _board):
+    # Keyed on the game and its round history, so tab switches reuse the frame
+    return _board.to_frame()
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def rating_history(games_rated, _ratings):
+    # One column per player, one row per rated game; rebuilt only when a game is added
+    import pandas as pd
+    return pd.DataFrame({
+        player: pd.Series([r for _, r in history], index=[game_id for game_id, _ in history])
+        for player, history in _ratings.history.items()
+    }).sort_index()
+
+
 def save_state_to_cookie():
-    state = {
-        "game_started": st.session_state.get("game_started"),
-        "game_start_time": st.session_state.get("game_start_time"),
-        "round_num": st.session_state.get("round_num"),
-        "player_order": st.session_state.get("player_order"),
-        "scores": st.session_state.get("scores"),
-        "scores_by_round": st.session_state.get("scores_by_round"),
-        "guesses": st.session_state.get("guesses"),
-        "awaiting_results": st.session_state.get("awaiting_results"),
-        "game_over": st.session_state.get("game_over"),
-    }
-    time.sleep(0.5)
-    raw = json.dumps(state).encode('utf-8')
-    compressed = base64.b64encode(zlib.compress(raw)).decode('ascii')
-    controller.set(COOKIE_KEY, compressed, max_age=30 * 24 * 60 * 60)
+    """Save the game; False if another device saved first and its version was loaded instead."""
+    with tracing.span("save"):
+        return _save_state_to_cookie()
+
+
+def _save_state_to_cookie():
+    game_id = st.session_state.get("game_start_time")
+    if game_id and game_id in store and st.session_state.get("store_game") != game_id:
+        # Only a session that came in with the join token may write to a hosted game
+        game_id = st.session_state.game_start_time = new_game_id()
+    if game_id:
+        # The game's log lives server-side; the cookie only needs to name the game
+        base = st.session_state.get("store_version") if st.session_state.get("store_game") == game_id else None
+        try:
+            st.session_state.store_version = store.put(game_id, current_log(), base)
+        except VersionConflict:
+            # Keep the other device's save; this change is dropped and its game shown instead
+            log, version = store.get(game_id)
+            apply_log(log)
+            st.session_state.store_version = version
+            st.session_state.tricks_won = {}
+            st.session_state.save_conflict = True
+            update_viewer(log, full=True)
+            return False
+        st.session_state.store_game = game_id
+        write_cookie(game_ref(game_id, store.join_token(game_id)))
+    else:
+        write_cookie(encode_state({key: st.session_state.get(key) for key in GAME_KEYS}))
+    return True
 
 # Save on rerun cycle
 if st.session_state.get("save_cookie"):
@@ -144,6 +439,8 @@ if st.session_state.get("rerun_pending"):
     st.session_state.rerun_pending = False
     st.rerun()
 
+tracing.phase("sidebar")
+
 
 if "openai_key" not in st.session_state:
     st.session_state.openai_key = ""
@@ -152,20 +449,52 @@ with st.sidebar.expander("🔑 AI Summary (Optional)"):
     st.text_input("Enter your OpenAI API key", type="password", key="openai_key")
 with st.sidebar.expander("🎙️ AI Voice (Optional)"):
     st.text_input("Enter your ElevenLabs API key", type="password", key="elevenlabs_key")
+    st.checkbox("Prepare audio in advance", key="prefetch_audio",
+                help="Generate the spoken summary for every style when the game ends (uses ElevenLabs credit).")
 
 if st.session_state.get("game_start_time"):
     safe_id = urllib.parse.quote(str(st.session_state["game_start_time"]))
     viewer_url = f"https://whist-score-viewer.streamlit.app/?game_id={safe_id}"
     #st.sidebar.markdown(f"[📊 View Live Scores]({viewer_url})")
     st.sidebar.text_input("External Scoreboard URL:", viewer_url)
-
-tab = st.sidebar.radio("Menu", ["Game", "Scores"], key="tab")
+    live = live_server()
+    if live is not None:
+        st.sidebar.text_input("Live Scoreboard URL:", live.url(st.session_state["game_start_time"]))
+    join_key = store.join_token(st.session_state["game_start_time"])
+    if join_key:
+        st.sidebar.markdown(f"[📱 Keep score on another device](?game={safe_id}&key={join_key})")
+
+if "outbox" in sys.modules or st.session_state.get("game_over"):
+    # Only once the outbox is loaded anyway, so a cold start doesn't pay for requests
+    sheet = sync_outbox().sheet_status()
+    if sheet["unsent"] or sheet["sending"]:
+        parts = [f"{sheet['unsent']} unsent"] if sheet["unsent"] else []
+        parts += [f"{sheet['sending']} sending"] if sheet["sending"] else []
+        st.sidebar.caption(f"📤 Sheet sync: {', '.join(parts)} · {sheet['accepted']} submitted")
+    elif sheet["accepted"]:
+        st.sidebar.caption(f"📤 Sheet sync: all {sheet['accepted']} finished games submitted")
+
+if tracing.ENABLED:
+    with st.sidebar.expander("⏱️ Performance"):
+        recent = st.session_state.get("trace_runs", [])
+        if not recent:
+            st.caption("No reruns traced yet.")
+        for run in reversed(recent):
+            phases = " · ".join(f"{name} {ms:.0f}" for name, ms in run.phase_ms().items())
+            st.caption(f"**{run.total_ms:.0f} ms** ({run.status})  \n{phases}")
+        st.caption(f"Trace file: `{tracing.TRACE_FILE}`")
+
+tab = st.sidebar.radio("Menu", ["Game", "Scores", "History"], key="tab")
+tracing.phase(f"{tab.lower()}_tab")
 if tab == "Game":
     if "game_started" not in st.session_state:
         st.session_state.game_started = False
         st.session_state.player_order = PLAYERS.copy()
 
-    st.title("Whist Scorekeeper :material/playing_cards:")
+    st.title(TITLE)
+    if st.session_state.pop("save_conflict", False):
+        st.warning("This game was updated on another device, so your last change wasn't saved. "
+                   "Here's the latest.")
 
     if not st.session_state.game_started:
         st.subheader("Start a New Game")
@@ -174,32 +503,19 @@ if tab == "Game":
 
 
         def start_game():
-            st.session_state.game_started = True
-
-            st.session_state.round_num = 0
-            st.session_state.scores = {p: 0 for p in PLAYERS}
-            st.session_state.scores_by_round = []
-            st.session_state.game_over = False
-            st.session_state.game_start_time = datetime.utcnow().isoformat(timespec="milliseconds")
-            game_id = st.session_state.game_start_time
+            game_id = new_game_id()
+            apply_log(GameLog(game_id, st.session_state.player_order))
 
             st.session_state.share_url = (
                 "https://whist-score-viewer.streamlit.app"
                 f"?game_id={urllib.parse.quote(game_id)}"
             )
 
-            # Link previous game to this one
+            # Link previous game to this one (sent in the background)
             try:
-                latest = requests.get("https://gameviewer.nathanamery.workers.dev/latest")
-                if latest.status_code == 200:
-                    prev_game_id = latest.text.strip()
-                    requests.post(
-                        f"https://gameviewer.nathanamery.workers.dev?game_id={prev_game_id}",
-                        headers={"Content-Type": "application/json"},
-                        json={"next_game_id": game_id}
-                    )
+                sync_outbox().link_previous(game_id)
             except Exception as e:
-                st.warning(f"Failed to link to previous game: {e}")
+                st.warning(f"Failed to queue link to previous game: {e}")
 
             st.session_state.save_cookie = True
         st.markdown("**Enter players in the order of play. Player 1 is first dealer:**")
@@ -257,7 +573,7 @@ if tab == "Game":
             save_state_to_cookie()
             st.stop()
         cards_this_round = ROUNDS[round_num]
-        suit_this_round = SUITS[round_num % len(SUITS)]
+        suit_this_round = trump_for_round(round_num)
         col1, col2 = st.columns(2)
 
         if round_num == 9:
@@ -273,15 +589,18 @@ if tab == "Game":
             st.subheader(f"Round {round_num + 1} | {cards_this_round} Cards | {suit_this_round}")
 
 
-        if not st.session_state.get("awaiting_results"):
+        # Guess and tricks entry are fragments: +/- clicks only rerun the form
+        # (hook and total checks included), and a submit costs one full rerun.
+        @st.fragment
+        @traced_fragment
+        def guess_entry(round_num, cards_this_round, suit_this_round):
             st.write("Enter Guesses")
 
             player_order = st.session_state.player_order
-            dealer_index = round_num % len(player_order)
-            dealer = player_order[dealer_index]
+            dealer = player_order[dealer_index(round_num, len(player_order))]
 
             # Rotate order so next after dealer starts
-            rotated_order = player_order[dealer_index + 1:] + player_order[:dealer_index + 1]
+            rotated_order = bidding_order(player_order, round_num)
 
             col1, col2 = st.columns(2)
             with col1:
@@ -297,13 +616,12 @@ if tab == "Game":
             #st.markdown("**Playing Order:** " + " → ".join(rotated_order))
 
             guesses = {}
-            total_so_far = 0
             num_players = len(player_order)
             col1, _ = st.columns([3, 1])  # wider col1
             with col1:
                 for i, player in enumerate(rotated_order):
                     if i == num_players - 1:
-                        invalid_guess = cards_this_round - total_so_far
+                        invalid_guess = hook_value(cards_this_round, guesses.values())
                         label = f"{player} (Can't guess {invalid_guess})" if invalid_guess >= 0 else f"{player}'s guess"
                         guess = st.number_input(
                             label,
@@ -318,36 +636,39 @@ if tab == "Game":
                             max_value=cards_this_round,
                             key=f"guess_{player}",
                         )
-                        total_so_far += guess
                     guesses[player] = guess
 
             valid_guesses = (
                     len(guesses) == num_players
-                    and guesses[rotated_order[-1]] != cards_this_round - total_so_far
+                    and guesses[rotated_order[-1]] != invalid_guess
             )
 
+            if st.toggle("🎲 Bid advisor", key="show_advisor"):
+                from advisor import advice
+
+                rows = []
+                with st.spinner("Simulating deals..."):
+                    for seat, player in enumerate(rotated_order):
+                        banned = invalid_guess if seat == num_players - 1 else None
+                        chances, scores = advice(round_num, seat, banned)
+                        best = max(scores, key=scores.get)
+                        row = {"Player": player, "Best bid": best}
+                        for bid in range(cards_this_round + 1):
+                            row[str(bid)] = f"{scores[bid]:.1f} ({chances[bid]:.0%})" if bid in scores else "–"
+                        rows.append(row)
+                st.dataframe(rows, hide_index=True)
+                st.caption("Expected score for each bid (chance of taking exactly that many tricks), "
+                           "from simulated deals of this round's shape.")
+
             if valid_guesses:
                 if st.button("Submit Guesses"):
-                    st.session_state.guesses = guesses
-                    st.session_state.awaiting_results = True
-                    st.session_state.save_cookie = True
-                    save_state_to_cookie()
-
-                    # Send round context to viewer
-                    try:
-                        viewer_payload = {
-                            "round_num": st.session_state.round_num,
-                            "dealer": st.session_state.player_order[
-                                st.session_state.round_num % len(st.session_state.player_order)],
-                            "guesses": st.session_state.guesses
-                        }
-                        requests.post(
-                            f"https://gameviewer.nathanamery.workers.dev?game_id={st.session_state['game_start_time']}",
-                            headers={"Content-Type": "application/json"},
-                            json=viewer_payload
-                        )
-                    except Exception as e:
-                        st.warning(f"Failed to update viewer state: {e}")
+                    with tracing.span("submit_guesses"):
+                        log = current_log()
+                        log.submit_guesses(guesses)
+                        apply_log(log)
+                        if save_state_to_cookie():
+                            # Send round context to viewer
+                            update_viewer(log)
 
                     st.rerun()
 
@@ -355,7 +676,9 @@ if tab == "Game":
             else:
                 st.warning(f"{rotated_order[-1]}'s guess can't be {invalid_guess}")
 
-        if st.session_state.get("awaiting_results"):
+        @st.fragment
+        @traced_fragment
+        def tricks_entry(round_num, cards_this_round):
             st.write("Enter Tricks Won")
 
             if "tricks_won" not in st.session_state:
@@ -367,19 +690,16 @@ if tab == "Game":
                     st.session_state.tricks_won[player] = st.number_input(
                         f"{player}'s tricks won",
                         min_value=0,
-                        max_value=ROUNDS[st.session_state.round_num],
+                        max_value=cards_this_round,
                         key=f"tricks_{player}"
                 )
                 with col2:
-                    guess = st.session_state.guesses.get(player, "—")
                     guess = st.session_state.guesses.get(player, 0)
                     tricks = st.session_state.tricks_won.get(player, 0)
-                    delta = "✓" if guess == tricks else "✗"
                     emoji = "✅" if guess == tricks else "❌"
                     st.metric(label=f"{player}'s Guess:", value=f"{guess} {emoji}")
 
             total_tricks = sum(st.session_state.tricks_won.values())
-            cards_this_round = ROUNDS[st.session_state.round_num]
 
             if total_tricks != cards_this_round:
                 st.info(f"Total tricks must equal {cards_this_round}. Currently: {total_tricks}")
@@ -389,49 +709,22 @@ if tab == "Game":
 
 
             if st.button("Submit Results", disabled=submit_disabled):
-                # print("DEBUG: Submit Results clicked")
-                # print(f"DEBUG: round_num before submit: {st.session_state.round_num}")
-                # print(f"DEBUG: len(ROUNDS): {len(ROUNDS)}")
-
-                round_data = {}
-                for player in st.session_state.player_order:
-                    guess = st.session_state.guesses.get(player, 0)
-                    tricks = st.session_state.tricks_won.get(player, 0)
-                    score = 10 + tricks if guess == tricks else tricks
-                    st.session_state.scores[player] += score
-                    round_data[player] = {"guess": guess, "score": score}
-
-                if "scores_by_round" not in st.session_state:
-                    st.session_state.scores_by_round = []
-                st.session_state.scores_by_round.append(round_data)
-                try:
-                    game_id = st.session_state["game_start_time"]
-                    payload = {
-                        "scores_by_round": st.session_state["scores_by_round"],
-                        "round_num": st.session_state.round_num + 1,
-                        "dealer": st.session_state.player_order[
-    (st.session_state.round_num + 1) % len(st.session_state.player_order)
-],
-                    }
-                    requests.post(
-                        f"https://gameviewer.nathanamery.workers.dev?game_id={game_id}",
-                        headers={"Content-Type": "application/json"},
-                        json=payload
-                    )
-                except Exception as e:
-                    st.warning(f"Failed to update viewer: {e}")
-                # Save BEFORE incrementing
-                st.session_state.save_cookie = True
-                save_state_to_cookie()
-
-                st.session_state.round_num += 1
-                st.session_state.awaiting_results = False
-
-                if st.session_state.round_num >= len(ROUNDS):
-                    st.session_state.game_over = True
+                with tracing.span("submit_results"):
+                    log = current_log()
+                    log.submit_results(st.session_state.tricks_won)
+                    apply_log(log)
+                    if save_state_to_cookie():
+                        update_viewer(log)
+                        if log.game_over:
+                            archive_game(log)
+                            prefetch_summaries(log)
 
                 st.rerun()
 
+        if st.session_state.get("awaiting_results"):
+            tricks_entry(round_num, cards_this_round)
+        else:
+            guess_entry(round_num, cards_this_round, suit_this_round)
 
 
 if tab == "Scores":
@@ -439,120 +732,91 @@ if tab == "Scores":
     if not scores_by_round:
         st.info("No hands played in this game yet")
     else:
-        # Build MultiIndex columns
-        rounds = [f"{ROUNDS[i]} {SUITS[i % len(SUITS)]}" for i in range(len(scores_by_round))]
-        df = pd.DataFrame(index=rounds)
-        for p in PLAYERS:
-            df[(p, "Guess")] = [r[p]["guess"] for r in scores_by_round]
-            df[(p, "Score")] = [r[p]["score"] for r in scores_by_round]
-        df.columns = pd.MultiIndex.from_product([PLAYERS, ["Guess", "Score"]])
-
-        # Add total row
-        totals = {
-            (p, "Guess"): "" for p in PLAYERS
-        }
-        final_scores = {}
-        for p in PLAYERS:
-            player_total = df[(p, "Score")].sum()
-            totals[(p, "Score")] = player_total
-            final_scores[p] = player_total
-        df.loc["Total"] = totals
+        board = get_scoreboard().sync(scores_by_round)
 
         # Show table
-        st.dataframe(df, height=560)
+        with tracing.span("scores_table"):
+            st.dataframe(
+                scores_table(st.session_state.get("game_start_time"), board.rounds_played, board.digest, board),
+                height=560,
+            )
 
         # Final rankings
         if st.session_state.get("round_num", 0) >= len(ROUNDS):
             st.subheader("🏆 Final Rankings")
-            sorted_scores = sorted(final_scores.items(), key=lambda x: x[1], reverse=True)
-            rankings, last_score, current_rank, offset = [], None, 0, 1
-            for player, score in sorted_scores:
-                if score != last_score:
-                    current_rank = offset
-                rankings.append((current_rank, player, score))
-                last_score = score
-                offset += 1
-            for rank, player, score in rankings:
-                st.markdown(f"**{rank}. {player}** – {score} points")
-
-            if st.session_state.openai_key:
-                st.subheader("📣 Match Summary")
-
-                if "summaries" not in st.session_state:
-                    st.session_state.summaries = {}
-
-                if "match_commentary" not in st.session_state:
-                    st.session_state.match_commentary = ""
-
-                style = st.selectbox("Choose commentary style", ["Football", "Formula 1"], index=0)
-
-                if style in st.session_state.summaries:
-                    commentary = st.session_state.summaries[style]
-                else:
-                    if style == "Football":
-                        system_prompt = "You're a lively British Premier League football commentator with a flair for drama and humour. Think John Motson meets Match of the Day."
-                    else:
-                        system_prompt = "You're a fast-paced, excitable British Formula 1 commentator. Think David Croft with a touch of Martin Brundle, recapping key moments lap by lap."
+            for position, player, score in board.rankings():
+                st.markdown(f"**{position}. {player}** – {score} points")
 
-                    prompt = f"""Use dramatic, humorous, and sports-style language to summarise a competitive countdown whist game.
-        Highlight standout performances, tight rounds, unexpected plays, and pivotal moments. Be aware that Campbell and Russell are scottish brothers, Dave was a postman from Skye and Nathan is English. Be sure to slag off Russell at any opportunity.
+            from commentary import STYLES, cached_commentary, stream_commentary
+            from match_report import report
 
-        Here is the full match data:
-        {json.dumps(st.session_state.get("scores_by_round", []), indent=2)}"""
+            st.subheader("📣 Match Summary")
 
-                    try:
-                        openai.api_key = st.session_state.openai_key
-                        with st.spinner("Generating post-match summary..."):
-                            response = openai.chat.completions.create(
-                                model="gpt-4-turbo",
-                                messages=[
-                                    {"role": "system", "content": system_prompt},
-                                    {"role": "user", "content": prompt}
-                                ],
-                                temperature=0.9,
-                            )
-                            commentary = response.choices[0].message.content
-                            st.session_state.summaries[style] = commentary
-                            st.session_state.match_commentary = commentary
-                    except Exception as e:
-                        st.error("Error generating summary. Check your API key or try again later.")
-                        st.exception(e)
+            if "summaries" not in st.session_state:
+                st.session_state.summaries = {}
 
-                if st.session_state.match_commentary:
-                    st.markdown(st.session_state.match_commentary)
+            style = st.selectbox("Choose commentary style", list(STYLES), index=0)
+
+            # The instant report shows straight away, and the AI version replaces it in place if there's a key
+            slot = st.empty()
+            commentary = st.session_state.summaries.get(style)
+            if commentary is None and st.session_state.openai_key:
+                commentary = cached_commentary(scores_by_round, style)
+            instant = None
+            if commentary is not None:
+                slot.markdown(commentary)
+            else:
+                instant = report(scores_by_round, style)
+                slot.markdown(instant)
+                if st.session_state.openai_key:
+                    try:
+                        # Follow the game-over prefetch if it's still writing this style, rather than asking again
+                        task = pending_summary("text", style)
+                        stream = task.follow() if task is not None else None
+                        stream = stream or stream_commentary(st.session_state.openai_key, scores_by_round, style)
+                        # Tokens replace the instant report from the first one on
+                        first = next(stream, None)
+                        if first is not None:
+                            with slot.container():
+                                commentary = st.write_stream(itertools.chain([first], stream))
+                    except Exception:
+                        commentary = None
+                        slot.markdown(instant)
+                        st.caption("⚠️ The AI summary isn't available right now (check your API key), so here's the instant one.")
+            if commentary:
+                st.session_state.summaries[style] = commentary
+            st.session_state.match_commentary = commentary or instant
 
             if st.session_state.get("match_commentary") and st.session_state.get("elevenlabs_key"):
-                if st.button("🔊 Speak Summary"):
-                    headers = {
-                        "xi-api-key": st.session_state.elevenlabs_key,
-                        "Accept": "audio/mpeg",
-                        "Content-Type": "application/json"
-                    }
-                    payload = {
-                        "text": st.session_state.match_commentary,
-                        "model_id": "eleven_multilingual_v2",
-
-                        "voice_settings": {
-                            "stability": 0.73,
-                            "similarity_boost": 0.75,
-                            "style": 0.06,
-                            "use_speaker_boost": True,
-                            "speed": 1.07
-                        }
-                    }
-
-                    with st.spinner("Generating audio..."):
-                        response = requests.post(
-                            "https://api.elevenlabs.io/v1/text-to-speech/eFsK7V4odsRpqOxGAOc8/stream",
-                            headers=headers,
-                            json=payload
+                from tts import cached_audio, synthesise
+
+                task = pending_summary("audio", style) if st.session_state.get("openai_key") else None
+                if task is not None and not task.done:
+                    with st.spinner("Finishing the audio..."):
+                        task.wait(timeout=60)
+                audio_path = cached_audio(st.session_state.match_commentary)
+                if audio_path is None and st.button("🔊 Speak Summary"):
+                    status = st.empty()
+                    try:
+                        audio_path = synthesise(
+                            st.session_state.elevenlabs_key,
+                            st.session_state.match_commentary,
+                            on_chunk=lambda received: status.caption(f"Generating audio... {received // 1024} KB"),
                         )
-
-                    if response.ok:
-                        audio_data = response.content
-                        st.audio(audio_data, format="audio/mpeg")
-                    else:
+                    except Exception:
                         st.error("Failed to get audio from ElevenLabs.")
+                    status.empty()
+                if audio_path:
+                    st.audio(audio_path, format="audio/mpeg")
+
+    from ratings import get_ratings
+
+    ratings = get_ratings()
+    if len(ratings):
+        st.subheader("📈 Ratings")
+        st.dataframe(ratings.table(), hide_index=True)
+        with st.expander("Rating history"):
+            st.line_chart(rating_history(len(ratings), ratings))
 
     if st.session_state.get("game_over"):
         st.subheader("📤 Submit Scores to Sheet")
@@ -561,47 +825,101 @@ if tab == "Scores":
             sheet_id = "1WKkTCiYHrtpOGvTccxDgtlMatEUMY_uaTGOasxxEQy0"
             password = st.text_input("Enter submission password", type="password", key="sheet_password")
 
+            # Every finished game that isn't on the sheet yet goes in the same request
+            unsent = sync_outbox().sheet_status()["unsent"]
+            if unsent > 1:
+                st.caption(f"{unsent} finished games haven't reached the sheet yet; they'll all be sent together.")
             if st.button("Submit Final Scores to Sheet"):
                 if not password:
                     st.warning("Password required to submit.")
                 else:
-                    game_start = st.session_state.get("game_start_time", "")
-                    payload = {
-                        "password": password,
-                        "sheet_id": sheet_id,
-                        "game_id": game_start,
-
-                        "scores": [
-                            {
-                                "Player": player,
-                                "Score": int(score)
-                            }
-                            for player, score in final_scores.items()
-                        ]
-                    }
                     try:
-                        with st.spinner("Submitting scores..."):
-                            res = requests.post(
-                                "https://whist-saver.nathanamery.workers.dev",
-                                headers={"Content-Type": "application/json"},
-                                json=payload
-                            )
-                        if res.status_code == 200:
-                            st.success("✅ Scores submitted successfully!")
-                            st.session_state.scores_submitted = True
-                            st.markdown(f"[View Sheet](https://docs.google.com/spreadsheets/d/{sheet_id})")
-                        elif res.status_code == 207:
-                            st.warning(res.text)
-                            st.markdown(f"[View Sheet](https://docs.google.com/spreadsheets/d/{sheet_id})")
-                        else:
-                            st.error(f"❌ Error: {res.text}")
+                        outbox = sync_outbox()
+                        outbox.queue_scores(st.session_state.get("game_start_time", ""), current_log().sheet_scores())
+                        job_id = outbox.submit_sheet(password, sheet_id)
+                        if job_id is not None:
+                            st.session_state.sheet_job = job_id
+                        st.session_state.scores_submitted = True
                     except Exception as e:
-                        st.error("Failed to submit scores.")
+                        st.error("Failed to queue score submission.")
                         st.exception(e)
 
+            sheet_job = st.session_state.get("sheet_job")
+            if sheet_job:
+                job = sync_outbox().job(sheet_job)
+                games = sync_outbox().sheet_games(sheet_job)
+                sent = [game_id for game_id, accepted, _ in games if accepted]
+                if job is None or job["status"] == "pending":
+                    attempts = job["attempts"] if job else 0
+                    st.info(f"⏳ Submission of {len(games)} game(s) queued (attempts so far: {attempts}). "
+                            "It will keep retrying in the background.")
+                else:
+                    if len(sent) == len(games):
+                        st.success(f"✅ {len(sent)} game(s) submitted successfully!")
+                    elif sent:
+                        st.warning(f"{len(sent)} of {len(games)} games submitted. The rest will go with the next submission.")
+                    else:
+                        st.error(f"❌ Error: {job['response'] or job['error']}")
+                    # Reasons for games left out, and warnings the saver gave about ones it took
+                    for game_id, accepted, error in games:
+                        if error or not accepted:
+                            st.caption(f"{'⚠️' if accepted else '❌'} {game_id}: {error or 'not accepted'}")
+                    if sent:
+                        st.markdown(f"[View Sheet](https://docs.google.com/spreadsheets/d/{sheet_id})")
+if tab == "History":
+    from archive import get_archive, hand_key
+    from engine import cards_in_round
+
+    st.title("📚 Game History")
+    archive = get_archive()
+    aggregates = archive.aggregates()
+    if not aggregates["games"]:
+        st.info("No finished games archived yet")
+    else:
+        st.caption(f"{aggregates['games']} finished game{'' if aggregates['games'] == 1 else 's'}")
+
+        st.subheader("Players")
+        st.dataframe([
+            {
+                "Player": player,
+                "Games": a["games"],
+                "Wins": a["wins"],
+                "Hit rate": f"{a['hits'] / a['rounds']:.0%}" if a["rounds"] else "–",
+                "Avg score / round": round(a["score"] / a["rounds"], 2) if a["rounds"] else None,
+            }
+            for player, a in sorted(aggregates["players"].items(), key=lambda x: -x[1]["wins"])
+        ], hide_index=True)
+
+        st.subheader("Average score by round")
+        rows = []
+        for r, a in sorted((int(k), v) for k, v in aggregates["rounds"].items()):
+            hand = aggregates["hands"][hand_key(cards_in_round(r), trump_for_round(r))]
+            rows.append({
+                "Round": r + 1,
+                "Cards": cards_in_round(r),
+                "Trump": trump_for_round(r),
+                "Avg score": round(a["score"] / a["rounds"], 2),
+                "Hit rate": f"{hand['hits'] / hand['rounds']:.0%}",
+            })
+        st.dataframe(rows, hide_index=True)
+
+        st.subheader("Hit rate by hand")
+        col1, col2 = st.columns(2)
+        who = col1.selectbox("Player", ["Everyone"] + sorted(aggregates["players"]))
+        group = col2.radio("Group by", ["Cards and trump", "Cards", "Trump"], horizontal=True)
+        by = {"Cards and trump": ["cards", "trump"], "Cards": ["cards"], "Trump": ["trump"]}[group]
+        with tracing.span("history_query", player=who, by=group):
+            rates = archive.hit_rates(by, player=None if who == "Everyone" else who)
+        st.dataframe(rates, hide_index=True, column_config={
+            "hit_rate": st.column_config.ProgressColumn("Hit rate", min_value=0.0, max_value=1.0, format="percent"),
+            "avg_score": st.column_config.NumberColumn("Avg score", format="%.2f"),
+        })
+
 if st.session_state.get("game_start_time"):
     st.markdown(
         f"<footer style='text-align: center; font-size: 0.75rem; color: gray;'>"
         f"Game ID: {st.session_state['game_start_time']}</footer>",
         unsafe_allow_html=True
     )
+
+finish_trace("ok")
@@ -0,0 +1,178 @@
+"""Instant match reports, written from templates with no network.
+
+The same highlights the AI prompt is built from (see highlights.extract)
+are narrated in the commentary styles, with the players' personas thrown
+in. The choice of phrasings is seeded from the scores, so a game always
+gets the same report and it doesn't change between reruns.
+"""
+import hashlib
+import json
+import random
+
+from engine import ROUNDS
+from highlights import extract
+
+PERSONAS = {
+    "Campbell": "the elder of the Scottish brothers",
+    "Russell": "the other Scottish brother",
+    "Dave": "the former Skye postman",
+    "Nathan": "the lone Englishman",
+}
+
+# Something unkind about Russell, per style. He would expect nothing less.
+RUSSELL_JABS = {
+    "Football": [
+        "Russell, meanwhile, played like a man who'd turned up for the wrong fixture.",
+        "And Russell? Russell was about as much use as a chocolate teapot at the back.",
+        "Russell put in a shift, in the sense that he was physically present.",
+    ],
+    "Formula 1": [
+        "Russell, meanwhile, spent most of the afternoon admiring the gravel traps.",
+        "Russell's race engineer has been on the radio for some time now, and he's stopped answering.",
+        "And Russell was lapped so often they considered giving him his own championship.",
+    ],
+}
+
+PHRASES = {
+    "Football": {
+        "unit": lambda r: f"the {ordinal(round((r + 1) * 90 / len(ROUNDS)))} minute",
+        "open": [
+            "What a match we've had here tonight, {rounds} rounds of countdown whist and not a dull moment.",
+            "The final whistle has gone and, oh my word, what a contest that was.",
+            "Welcome back to the studio, where we're still catching our breath after that one.",
+        ],
+        "first_lead": "{leader} drew first blood in {when}, {persona} setting the early tempo.",
+        "lead_change": [
+            "{leader} took over at the top in {when} on {total}.",
+            "In {when} {leader} went in front with {total} and the crowd were on their feet.",
+            "{leader} nicked the lead in {when}, {total} on the board.",
+        ],
+        "tie": "It was all square at the top in {when}, {leaders} locked together on {total}.",
+        "hot_streak": "{player} hit {length} bids on the bounce from round {first} to round {last}; you simply can't defend against that.",
+        "cold_streak": "{player} missed {length} in a row between rounds {first} and {last}, a spell the manager will want to forget.",
+        "swing": "The goal of the game came in {when}: {player} banged in {score} in a single round.",
+        "hooked": "Heartbreak for {player} in {when}, barred from bidding {banned} on the deal, and then took exactly that many.",
+        "win": [
+            "{winner} lifts the trophy with {score}, {margin} clear of the chasing pack.",
+            "It's {winner} who takes all three points, finishing on {score} and {margin} ahead.",
+        ],
+        "draw": "We couldn't separate {winners}, level on {score} at full time. Honours even!",
+        "table": "Final table: {table}.",
+        "close": [
+            "Scenes. Absolute scenes.",
+            "You couldn't write it. Back to you in the studio.",
+            "And that, ladies and gentlemen, is why we love this game.",
+        ],
+    },
+    "Formula 1": {
+        "unit": lambda r: f"lap {r + 1}",
+        "open": [
+            "And it's lights out and away we went: {rounds} laps of countdown whist, and what a race it's been.",
+            "The chequered flag has fallen on a thrilling grand prix of countdown whist.",
+            "{rounds} laps, {drivers} drivers, and more drama than a wet Sunday at Spa.",
+        ],
+        "first_lead": "{leader} got the better start and led into turn one on {when}, {persona} with the hammer down.",
+        "lead_change": [
+            "{leader} made the move stick on {when}, P1 with {total}.",
+            "Into the lead goes {leader} on {when}, {total} points and pulling away.",
+            "{leader} found the gap on {when} and took the lead on {total}.",
+        ],
+        "tie": "Wheel to wheel on {when}! {leaders} dead level on {total}.",
+        "hot_streak": "{player} strung together {length} perfect laps from lap {first} to lap {last}, purple sectors everywhere.",
+        "cold_streak": "{player} had a nightmare stint, {length} misses in a row from lap {first} to lap {last}. Box, box, box.",
+        "swing": "Fastest lap of the race goes to {player}, {score} points on {when}.",
+        "hooked": "Disaster for {player} on {when}, blocked from calling {banned} by the regulations, and then took exactly {banned}. The stewards couldn't believe it.",
+        "win": [
+            "{winner} takes the chequered flag on {score} points, {margin} clear at the line.",
+            "It's a magnificent victory for {winner}, {score} points and a gap of {margin}.",
+        ],
+        "draw": "A photo finish! {winners} cross the line together on {score}.",
+        "table": "Classification: {table}.",
+        "close": [
+            "What a race. What. A. Race.",
+            "Get in there! That's one for the history books.",
+            "And the champagne is flowing on the podium.",
+        ],
+    },
+}
+
+
+def ordinal(n):
+    suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+
+def _names(players):
+    return players[0] if len(players) == 1 else ", ".join(players[:-1]) + " and " + players[-1]
+
+
+def _seed(scores_by_round, style):
+    text = json.dumps(scores_by_round, sort_keys=True) + style
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def report(scores_by_round, style):
+    """A full match report for a finished (or part-played) game, in markdown."""
+    if not scores_by_round:
+        return ""
+    h = extract(scores_by_round)
+    phrases = PHRASES.get(style) or PHRASES["Football"]
+    rng = random.Random(_seed(scores_by_round, style))
+    decks = {}
+
+    def pick(options):
+        # Deal phrasings from a shuffled deck, so repeats only come once it's used up
+        deck = decks.setdefault(id(options), [])
+        if not deck:
+            deck.extend(rng.sample(options, len(options)))
+        return deck.pop()
+
+    when = phrases["unit"]
+    persona = lambda p: PERSONAS.get(p, "the newcomer")
+
+    paragraphs = [pick(phrases["open"]).format(rounds=h["rounds"], drivers=len(h["players"]))]
+
+    # How the lead changed hands, with the level moments in between
+    story = []
+    lead_changes = h["lead_changes"]
+    if lead_changes:
+        r, leaders, total = lead_changes[0]
+        if len(leaders) == 1:
+            story.append(phrases["first_lead"].format(leader=leaders[0], when=when(r), persona=persona(leaders[0])))
+        for r, leaders, total in lead_changes[1:]:
+            if len(leaders) == 1:
+                story.append(pick(phrases["lead_change"]).format(leader=leaders[0], when=when(r), total=total))
+    if h["ties"]:
+        r, leaders, total = h["ties"][-1]
+        story.append(phrases["tie"].format(leaders=_names(leaders), when=when(r), total=total))
+    if story:
+        paragraphs.append(" ".join(story))
+
+    # The moments: the biggest round, the longest runs and anyone hooked
+    moments = []
+    _, r, player, score = h["swings"][0]
+    moments.append(phrases["swing"].format(player=player, score=score, when=when(r)))
+    hot = max(h["players"], key=lambda p: h["streaks"][p, True][0])
+    length, first, last = h["streaks"][hot, True]
+    if length >= 3:
+        moments.append(phrases["hot_streak"].format(player=hot, length=length, first=first + 1, last=last + 1))
+    cold = max(h["players"], key=lambda p: h["streaks"][p, False][0])
+    length, first, last = h["streaks"][cold, False]
+    if length >= 3:
+        moments.append(phrases["cold_streak"].format(player=cold, length=length, first=first + 1, last=last + 1))
+    for r, player, banned in h["hooked"][:2]:
+        moments.append(phrases["hooked"].format(player=player, banned=banned, when=when(r)))
+    if "Russell" in h["players"]:
+        moments.append(pick(RUSSELL_JABS.get(style) or RUSSELL_JABS["Football"]))
+    paragraphs.append(" ".join(moments))
+
+    # The result
+    standings = h["standings"]
+    top = standings[0][2]
+    if len(h["winners"]) == 1:
+        result = pick(phrases["win"]).format(winner=h["winners"][0], score=top, margin=h["margin"])
+    else:
+        result = phrases["draw"].format(winners=_names(h["winners"]), score=top)
+    table = ", ".join(f"{position}. {p} {score}" for position, p, score in standings)
+    paragraphs.append(f"{result} {phrases['table'].format(table=table)} {pick(phrases['close'])}")
+    return "\n\n".join(paragraphs)
@@ -0,0 +1,413 @@
+"""Background delivery for the viewer worker and whist-saver.
+
+Calls are written to a small SQLite queue and sent by a process-wide
+thread pool, so a submit in the UI only pays for an insert. Jobs for the
+same game_id are always sent one at a time, oldest first.
+
+Viewer updates are sequence-numbered deltas (see GameLog.viewer_delta);
+the viewer answers 409 when it notices a gap and gets the whole board
+instead. Bodies can be gzipped with WHIST_VIEWER_GZIP=1.
+
+Finished games wait in sheet_games until they're submitted to the sheet.
+Every unsent game goes to whist-saver in one batch, keyed by its game_id
+(the game_start_time), so sending a game twice doesn't duplicate rows.
+The 200/207 answer lists which games were accepted; the rest stay unsent
+and go out with the next batch. A saver that doesn't answer in that shape
+gets one request per game instead.
+"""
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import tracing
+
+VIEWER_URL = os.environ.get("WHIST_VIEWER_URL", "https://gameviewer.nathanamery.workers.dev")
+SAVER_URL = os.environ.get("WHIST_SAVER_URL", "https://whist-saver.nathanamery.workers.dev")
+VIEWER_GZIP = os.environ.get("WHIST_VIEWER_GZIP", "") not in ("", "0")
+GZIP_MIN_BYTES = 1024
+DB_PATH = os.environ.get("WHIST_OUTBOX_DB", os.path.join(".whist", "outbox.sqlite3"))
+
+TIMEOUT = (3.05, 10)  # connect, read
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+PENDING, DONE, FAILED = "pending", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    body TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_at REAL NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    code INTEGER,
+    response TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (game_id, status, id);
+CREATE TABLE IF NOT EXISTS sheet_games (
+    game_id TEXT PRIMARY KEY,
+    scores TEXT NOT NULL,
+    created REAL NOT NULL,
+    job_id INTEGER,
+    accepted REAL,
+    error TEXT
+);
+"""
+
+SHEET_QUEUE = "sheet"  # the jobs game_id batches go under, so one is in flight at a time
+
+
+def viewer_url(game_id):
+    return f"{VIEWER_URL}?game_id={game_id}"
+
+
+def acknowledged_seq(res):
+    # Viewers that understand deltas answer with the last sequence number they hold
+    try:
+        return isinstance(res.json(), dict) and "seq" in res.json()
+    except ValueError:
+        return False
+
+
+def sheet_results(res, game_ids):
+    """(accepted game_ids, {game_id: reason}) from whist-saver's answer to a batch.
+
+    Only games the answer names are settled. None if it isn't a batch
+    answer at all, e.g. a saver that ignored "games" and said "OK".
+    """
+    try:
+        data = res.json()
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or not ("accepted" in data or "rejected" in data):
+        return None
+    accepted, rejected = data.get("accepted") or [], data.get("rejected") or {}
+    if not isinstance(accepted, list) or not isinstance(rejected, (dict, list)):
+        return None
+    if isinstance(rejected, list):
+        rejected = dict.fromkeys(rejected, "rejected")
+    return ([g for g in accepted if g in game_ids],
+            {g: str(reason) for g, reason in rejected.items() if g in game_ids})
+
+
+def backoff(attempts):
+    return min(BACKOFF_CAP, BACKOFF_BASE * (2 ** (attempts - 1)))
+
+
+class Outbox:
+    def __init__(self, path=DB_PATH, workers=4, session=None):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._active = set()
+        self._timers = {}
+        self._closed = False
+
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="outbox")
+
+        self._handlers = {
+            "post": self._send_post,
+            "link_previous": self._send_link_previous,
+            "viewer_sync": self._send_viewer_sync,
+            "sheet_batch": self._send_sheet_batch,
+        }
+        self._viewer_legacy = False  # set once the viewer shows it doesn't speak deltas
+        self._sheet_legacy = False   # set once whist-saver shows it only takes one game per request
+
+        # Anything left over from a previous process gets picked up again
+        for (game_id,) in self._query("SELECT DISTINCT game_id FROM jobs WHERE status = ?", (PENDING,)):
+            self._schedule(game_id)
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def _exec(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).lastrowid
+
+    # -- public API ---------------------------------------------------------
+
+    def enqueue(self, game_id, url, body=None, kind="post"):
+        """Queue a job and return its id straight away."""
+        job_id = self._exec(
+            "INSERT INTO jobs (game_id, kind, url, body, created) VALUES (?, ?, ?, ?, ?)",
+            (str(game_id), kind, url, json.dumps(body), time.time()),
+        )
+        self._schedule(str(game_id))
+        return job_id
+
+    def sync_viewer(self, game_id, delta, snapshot):
+        """Send the viewer a delta, falling back to the snapshot if it asks for a resync."""
+        return self.enqueue(game_id, viewer_url(game_id), {"delta": delta, "full": snapshot}, kind="viewer_sync")
+
+    def queue_scores(self, game_id, scores):
+        """Remember a finished game's scores until they're on the sheet (idempotent)."""
+        self._exec(
+            "INSERT OR IGNORE INTO sheet_games (game_id, scores, created) VALUES (?, ?, ?)",
+            (str(game_id), json.dumps(scores), time.time()),
+        )
+
+    def submit_sheet(self, password, sheet_id):
+        """Send every unsent game in one request; returns the job id, or None if there's nothing to send."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT game_id, scores FROM sheet_games WHERE accepted IS NULL AND (job_id IS NULL OR "
+                "job_id NOT IN (SELECT id FROM jobs WHERE status = ?)) ORDER BY created",
+                (PENDING,),
+            ).fetchall()
+            if not rows:
+                return None
+            body = {
+                "password": password,
+                "sheet_id": sheet_id,
+                "games": [{"game_id": game_id, "scores": json.loads(scores)} for game_id, scores in rows],
+            }
+            job_id = self._db.execute(
+                "INSERT INTO jobs (game_id, kind, url, body, created) VALUES (?, ?, ?, ?, ?)",
+                (SHEET_QUEUE, "sheet_batch", SAVER_URL, json.dumps(body), time.time()),
+            ).lastrowid
+            self._db.executemany(
+                "UPDATE sheet_games SET job_id = ?, error = NULL WHERE game_id = ?",
+                [(job_id, game_id) for game_id, _ in rows],
+            )
+        self._schedule(SHEET_QUEUE)
+        return job_id
+
+    def sheet_status(self):
+        """Counts of finished games by where they are: unsent, sending and accepted."""
+        rows = self._query(
+            "SELECT CASE WHEN s.accepted IS NOT NULL THEN 'accepted' "
+            "WHEN j.status = ? THEN 'sending' ELSE 'unsent' END, COUNT(*) "
+            "FROM sheet_games s LEFT JOIN jobs j ON j.id = s.job_id GROUP BY 1",
+            (PENDING,),
+        )
+        return dict({"unsent": 0, "sending": 0, "accepted": 0}, **dict(rows))
+
+    def sheet_games(self, job_id):
+        """(game_id, accepted, error) for each game in a batch."""
+        return self._query(
+            "SELECT game_id, accepted IS NOT NULL, error FROM sheet_games WHERE job_id = ? ORDER BY created",
+            (job_id,),
+        )
+
+    def link_previous(self, game_id):
+        return self.enqueue(game_id, f"{VIEWER_URL}/latest", {"next_game_id": game_id}, kind="link_previous")
+
+    def job(self, job_id):
+        rows = self._query(
+            "SELECT id, game_id, kind, status, attempts, code, response, error FROM jobs WHERE id = ?",
+            (job_id,),
+        )
+        if not rows:
+            return None
+        keys = ("id", "game_id", "kind", "status", "attempts", "code", "response", "error")
+        return dict(zip(keys, rows[0]))
+
+    def pending(self, game_id=None):
+        if game_id is None:
+            return self._query("SELECT COUNT(*) FROM jobs WHERE status = ?", (PENDING,))[0][0]
+        return self._query(
+            "SELECT COUNT(*) FROM jobs WHERE status = ? AND game_id = ?", (PENDING, str(game_id))
+        )[0][0]
+
+    def wait_idle(self, timeout=10.0):
+        """Block until nothing is pending (used by scripts and benchmarks)."""
+        deadline = time.monotonic() + timeout
+        while self.pending():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.02)
+        return True
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+        self._pool.shutdown(wait=True)
+        self.session.close()
+
+    # -- delivery -----------------------------------------------------------
+
+    def _schedule(self, game_id):
+        if self._closed:
+            return
+        with self._lock:
+            if game_id in self._active:
+                return
+            self._active.add(game_id)
+            self._timers.pop(game_id, None)
+        self._pool.submit(self._drain, game_id)
+
+    def _drain(self, game_id):
+        try:
+            while not self._closed:
+                rows = self._query(
+                    "SELECT id, kind, url, body, attempts, next_at FROM jobs "
+                    "WHERE game_id = ? AND status = ? ORDER BY id LIMIT 1",
+                    (game_id, PENDING),
+                )
+                if not rows:
+                    return
+                job_id, kind, url, body, attempts, next_at = rows[0]
+                wait = next_at - time.time()
+                if wait > 0:
+                    self._retry_later(game_id, wait)
+                    return
+                try:
+                    self._deliver(job_id, kind, url, json.loads(body) if body else None, attempts)
+                except Exception as e:
+                    # Never leave the row untouched, or the reschedule below would spin on it
+                    self._exec(
+                        "UPDATE jobs SET status = ?, attempts = ?, error = ?, body = NULL WHERE id = ?",
+                        (FAILED, attempts + 1, f"{type(e).__name__}: {e}", job_id),
+                    )
+        finally:
+            with self._lock:
+                self._active.discard(game_id)
+            if not self._closed and game_id not in self._timers and self.pending(game_id):
+                self._schedule(game_id)
+
+    def _retry_later(self, game_id, delay):
+        timer = threading.Timer(delay, self._schedule, (game_id,))
+        timer.daemon = True
+        with self._lock:
+            self._timers[game_id] = timer
+        timer.start()
+
+    def _deliver(self, job_id, kind, url, body, attempts):
+        attempts += 1
+        with tracing.span(f"outbox.{kind}", attempt=attempts) as span:
+            try:
+                res = self._handlers[kind](url, body)
+            except Exception as e:
+                # Network errors, and anything a handler trips over, count as a failed attempt
+                res, error = None, f"{type(e).__name__}: {e}"
+            else:
+                error = None if res.ok else f"HTTP {res.status_code}"
+            span.set(code=res.status_code if res is not None else None)
+
+        if res is not None and (res.ok or res.status_code not in RETRY_STATUS):
+            # Delivered (or rejected for good) - drop the body so passwords don't linger on disk
+            self._exec(
+                "UPDATE jobs SET status = ?, attempts = ?, code = ?, response = ?, error = ?, body = NULL "
+                "WHERE id = ?",
+                (DONE if res.ok else FAILED, attempts, res.status_code, res.text[:2000], error, job_id),
+            )
+        elif attempts >= MAX_ATTEMPTS:
+            self._exec(
+                "UPDATE jobs SET status = ?, attempts = ?, error = ?, body = NULL WHERE id = ?",
+                (FAILED, attempts, error, job_id),
+            )
+        else:
+            self._exec(
+                "UPDATE jobs SET attempts = ?, next_at = ?, error = ? WHERE id = ?",
+                (attempts, time.time() + backoff(attempts), error, job_id),
+            )
+
+    def _send_post(self, url, body):
+        return self.session.post(url, json=body, timeout=TIMEOUT)
+
+    def _send_viewer_sync(self, url, body):
+        if self._viewer_legacy:
+            return self._post_json(url, body["full"])
+        res = self._post_json(url, body["delta"])
+        if res.status_code == 409:
+            # The viewer saw a gap in the sequence numbers (a lost or failed update)
+            return self._post_json(url, body["full"])
+        if res.ok and not acknowledged_seq(res):
+            # An older viewer that stores whatever it's sent: give it the whole board from now on
+            self._viewer_legacy = True
+            return self._post_json(url, body["full"])
+        return res
+
+    def _send_sheet_batch(self, url, body):
+        games = {game["game_id"]: game for game in body["games"]}
+        if not self._sheet_legacy:
+            res = self.session.post(url, json=body, timeout=TIMEOUT)
+            results = sheet_results(res, games) if res.status_code in (200, 207) else None
+            if results is not None:
+                self._settle_sheet_games(*results)
+                return res
+            if res.status_code not in (200, 207, 400, 404, 422):
+                return res
+            # An older whist-saver that doesn't know "games": one request per game from now on
+            self._sheet_legacy = True
+        res = None
+        accepted = {g for (g,) in self._query("SELECT game_id FROM sheet_games WHERE accepted IS NOT NULL")}
+        for game_id, game in games.items():
+            if game_id in accepted:
+                continue
+            res = self.session.post(url, json={
+                "password": body["password"], "sheet_id": body["sheet_id"], "game_id": game_id, "scores": game["scores"],
+            }, timeout=TIMEOUT)
+            if res.status_code == 200:
+                self._settle_sheet_games([game_id], {})
+            elif res.status_code == 207:
+                # Partly recorded: sending it again could duplicate rows, so keep the warning instead
+                self._settle_sheet_games([game_id], {}, warnings={game_id: res.text[:200]})
+            elif res.status_code in RETRY_STATUS:
+                return res  # retried later; games already accepted aren't sent again
+            else:
+                self._settle_sheet_games([], {game_id: f"HTTP {res.status_code}: {res.text[:200]}"})
+        return res
+
+    def _settle_sheet_games(self, accepted, rejected, warnings=None):
+        now = time.time()
+        warnings = warnings or {}
+        with self._lock:
+            self._db.executemany("UPDATE sheet_games SET accepted = ?, error = ? WHERE game_id = ?",
+                                 [(now, warnings.get(g), g) for g in accepted])
+            self._db.executemany("UPDATE sheet_games SET error = ? WHERE game_id = ?",
+                                 [(reason, g) for g, reason in rejected.items()])
+
+    def _post_json(self, url, body):
+        data = json.dumps(body, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if VIEWER_GZIP and len(data) >= GZIP_MIN_BYTES:
+            data = gzip.compress(data)
+            headers["Content-Encoding"] = "gzip"
+        return self.session.post(url, data=data, headers=headers, timeout=TIMEOUT)
+
+    def _send_link_previous(self, url, body):
+        latest = self.session.get(url, timeout=TIMEOUT)
+        if latest.status_code != 200:
+            return latest
+        prev_game_id = latest.text.strip()
+        return self.session.post(viewer_url(prev_game_id), json=body, timeout=TIMEOUT)
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox():
+    """Process-wide outbox shared by every Streamlit session."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = Outbox()
+        return _outbox
@@ -0,0 +1,149 @@
+"""Speculative commentary (and optionally audio) generation at game over.
+
+As soon as the last results are in, every commentary style is generated
+on a background pool, so the Scores tab usually finds it cached. A tab
+opened while a style is still streaming follows that stream with
+follow(), rather than paying for a second request. Everything for a game
+stops with cancel() if it's abandoned or replayed. A cancelled stream
+never reaches the caches, because they only keep entries that finish.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from commentary import STYLES, cached_commentary, stream_commentary
+
+WORKERS = 4
+KEEP_GAMES = 16
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Task:
+    """One background result that can be followed while it's produced."""
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self._cond = threading.Condition()
+
+    def append(self, part):
+        with self._cond:
+            self.parts.append(part)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done, self.error = True, error
+            self._cond.notify_all()
+
+    def follow(self):
+        """Yield what's been produced so far, then the rest as it arrives."""
+        sent = 0
+        while True:
+            with self._cond:
+                while sent == len(self.parts) and not self.done:
+                    self._cond.wait()
+                parts, done, error = self.parts[sent:], self.done, self.error
+            sent += len(parts)
+            yield from parts
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+    def wait(self, timeout=None):
+        with self._cond:
+            self._cond.wait_for(lambda: self.done, timeout)
+            return self.done and self.error is None
+
+
+class Prefetcher:
+    def __init__(self, workers=WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._games = {}  # game_id -> (cancel event, {(kind, style): Task})
+
+    def start(self, game_id, scores_by_round, openai_key, elevenlabs_key=None):
+        """Start generating every style for a finished game (once per game)."""
+        with self._lock:
+            if game_id in self._games or not openai_key:
+                return
+            cancel, tasks = threading.Event(), {}
+            self._games[game_id] = (cancel, tasks)
+            while len(self._games) > KEEP_GAMES:
+                self._games.pop(next(iter(self._games)))[0].set()
+            for style in STYLES:
+                tasks["text", style] = Task()
+                if elevenlabs_key:
+                    tasks["audio", style] = Task()
+        for style in STYLES:
+            self._pool.submit(
+                self._run, cancel, tasks["text", style], tasks.get(("audio", style)),
+                scores_by_round, style, openai_key, elevenlabs_key,
+            )
+
+    def _run(self, cancel, text_task, audio_task, scores_by_round, style, openai_key, elevenlabs_key):
+        try:
+            text = cached_commentary(scores_by_round, style)
+            if text is None:
+                stream = stream_commentary(openai_key, scores_by_round, style)
+                try:
+                    for part in stream:
+                        if cancel.is_set():
+                            raise Cancelled()
+                        text_task.append(part)
+                finally:
+                    stream.close()
+                text = "".join(text_task.parts)
+            else:
+                text_task.append(text)
+            text_task.finish()
+        except Exception as e:
+            text_task.finish(e)
+            if audio_task is not None:
+                audio_task.finish(e)
+            return
+
+        if audio_task is None:
+            return
+        try:
+            from tts import cached_audio, iter_speech
+
+            if cached_audio(text) is None:
+                speech = iter_speech(elevenlabs_key, text)
+                try:
+                    for _ in speech:
+                        if cancel.is_set():
+                            raise Cancelled()
+                finally:
+                    speech.close()
+            audio_task.finish()
+        except Exception as e:
+            audio_task.finish(e)
+
+    def task(self, game_id, kind, style):
+        with self._lock:
+            entry = self._games.get(game_id)
+        return entry[1].get((kind, style)) if entry else None
+
+    def cancel(self, game_id):
+        with self._lock:
+            entry = self._games.pop(game_id, None)
+        if entry is not None:
+            entry[0].set()
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher():
+    """Process-wide prefetcher shared by every Streamlit session."""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher()
+        return _prefetcher
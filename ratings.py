@@ -0,0 +1,163 @@
+"""Elo ratings across every finished game.
+
+A game counts as a round robin of head-to-head results: for each pair of
+players the higher final total wins and equal totals draw. A player's
+rating moves by K / (players - 1) times the sum of their results minus
+the expected ones. Adding a game touches only that game's players; recompute()
+replays a whole archive, with every game's result matrix built in one
+numpy pass. State (ratings, games played and each player's rating after
+every game) is kept in a small JSON file next to the archive.
+"""
+import json
+import os
+import tempfile
+import threading
+
+RATINGS_FILE = os.environ.get(
+    "WHIST_RATINGS_FILE",
+    os.path.join(os.environ.get("WHIST_ARCHIVE_DIR", os.path.join(".whist", "archive")), "ratings.json"),
+)
+BASE_RATING = 1500.0
+K = 32.0
+SCALE = 400.0
+STATE_VERSION = 1
+
+
+def expected(rating, opponent):
+    return 1.0 / (1.0 + 10 ** ((opponent - rating) / SCALE))
+
+
+def game_deltas(ratings, totals):
+    """Rating change for each player in one game, given {player: final total}."""
+    players = list(totals)
+    if len(players) < 2:
+        return dict.fromkeys(players, 0.0)
+    current = {p: ratings.get(p, BASE_RATING) for p in players}
+    weight = K / (len(players) - 1)
+    deltas = {}
+    for p in players:
+        change = 0.0
+        for q in players:
+            if q != p:
+                result = 1.0 if totals[p] > totals[q] else 0.5 if totals[p] == totals[q] else 0.0
+                change += result - expected(current[p], current[q])
+        deltas[p] = weight * change
+    return deltas
+
+
+class Ratings:
+    def __init__(self, path=RATINGS_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self.reset()
+        try:
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("version") == STATE_VERSION:
+                self.ratings, self.played, self.history = saved["ratings"], saved["played"], saved["history"]
+                self.rated = set(saved["rated"])
+        except FileNotFoundError:
+            pass
+
+    def reset(self):
+        self.ratings = {}  # player -> rating
+        self.played = {}   # player -> games rated
+        self.history = {}  # player -> [[game_id, rating after it], ...]
+        self.rated = set()
+
+    def save(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": STATE_VERSION,
+                "ratings": self.ratings,
+                "played": self.played,
+                "history": self.history,
+                "rated": sorted(self.rated),
+            }, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    def _apply(self, game_id, new_ratings):
+        for p, rating in new_ratings.items():
+            self.ratings[p] = rating
+            self.played[p] = self.played.get(p, 0) + 1
+            self.history.setdefault(p, []).append([game_id, round(rating, 2)])
+        self.rated.add(game_id)
+
+    def record(self, game_id, totals, save=True):
+        """Rate one finished game; returns the changes, or None if it was already rated."""
+        with self._lock:
+            if game_id in self.rated:
+                return None
+            deltas = game_deltas(self.ratings, totals)
+            self._apply(game_id, {p: self.ratings.get(p, BASE_RATING) + d for p, d in deltas.items()})
+            if save:
+                self.save()
+            return deltas
+
+    def recompute(self, games):
+        """Rebuild from scratch from (game_id, {player: total}) pairs, oldest first."""
+        import numpy as np
+
+        games = list(games)
+        players = sorted({p for _, totals in games for p in totals})
+        index = {p: i for i, p in enumerate(players)}
+        totals = np.full((len(games), len(players)), np.nan)
+        for g, (_, game_totals) in enumerate(games):
+            for p, total in game_totals.items():
+                totals[g, index[p]] = total
+
+        # Head-to-head results for every game at once: results[g, i, j] is i's result against j
+        present = ~np.isnan(totals)
+        pairs = present[:, :, None] & present[:, None, :] & ~np.eye(len(players), dtype=bool)
+        diff = np.nan_to_num(totals[:, :, None] - totals[:, None, :])
+        results = np.where(diff > 0, 1.0, np.where(diff == 0, 0.5, 0.0))
+        weights = K / np.maximum(pairs.any(axis=2).sum(axis=1) - 1, 1)
+
+        with self._lock:
+            self.reset()
+            rating = np.full(len(players), BASE_RATING)
+            for g, (game_id, _) in enumerate(games):
+                expect = 1.0 / (1.0 + 10 ** ((rating[None, :] - rating[:, None]) / SCALE))
+                rating = rating + weights[g] * np.where(pairs[g], results[g] - expect, 0.0).sum(axis=1)
+                self._apply(game_id, {players[i]: float(rating[i]) for i in np.flatnonzero(present[g])})
+            self.save()
+
+    def recompute_from_archive(self, archive):
+        import pyarrow as pa
+
+        table = archive.table()
+        table = table.set_column(table.schema.get_field_index("player"), "player", table["player"].cast(pa.string()))
+        totals = table.group_by(["game_id", "player"]).aggregate([("score", "sum")]).sort_by("game_id")
+        games = {}
+        for game_id, player, total in zip(*(totals[c].to_pylist() for c in ("game_id", "player", "score_sum"))):
+            games.setdefault(game_id, {})[player] = total
+        self.recompute(sorted(games.items()))
+
+    def table(self):
+        """Rows for the ratings table, best first."""
+        rows = []
+        for p, rating in sorted(self.ratings.items(), key=lambda x: -x[1]):
+            history = self.history.get(p, [])
+            previous = history[-2][1] if len(history) > 1 else BASE_RATING
+            rows.append({"Player": p, "Rating": round(rating), "Last game": round(rating - previous, 1),
+                         "Games": self.played.get(p, 0)})
+        return rows
+
+    def __len__(self):
+        return len(self.rated)
+
+
+_ratings = None
+_ratings_lock = threading.Lock()
+
+
+def get_ratings():
+    """Process-wide ratings shared by every Streamlit session."""
+    global _ratings
+    with _ratings_lock:
+        if _ratings is None:
+            _ratings = Ratings()
+        return _ratings
@@ -0,0 +1,71 @@
+"""Running scoreboard for the Scores tab, updated a round at a time."""
+import hashlib
+
+from engine import ROUNDS, trump_for_round, rank
+
+
+class Scoreboard:
+    def __init__(self, players):
+        self.players = list(players)
+        self.rows = []      # per round: ((guess, score), ...) in self.players order
+        self.running = []   # per round: running totals after that round
+        self.digests = []   # per round: digest of every row up to and including it
+
+    @property
+    def rounds_played(self):
+        return len(self.rows)
+
+    @property
+    def digest(self):
+        return self.digests[-1] if self.digests else ""
+
+    @property
+    def totals(self):
+        last = self.running[-1] if self.running else (0,) * len(self.players)
+        return dict(zip(self.players, last))
+
+    def rankings(self):
+        return rank(self.totals)
+
+    def append(self, round_data):
+        self._append_row(self._row(round_data))
+
+    def _append_row(self, row):
+        prev = self.running[-1] if self.running else (0,) * len(self.players)
+        self.rows.append(row)
+        self.running.append(tuple(t + score for t, (_, score) in zip(prev, row)))
+        self.digests.append(hashlib.sha1(f"{self.digest}|{row}".encode()).hexdigest()[:16])
+
+    def truncate(self, rounds):
+        del self.rows[rounds:]
+        del self.running[rounds:]
+        del self.digests[rounds:]
+
+    def sync(self, scores_by_round):
+        """Catch up with scores_by_round, e.g. after a cookie restore or a replay.
+
+        Every round is compared, so an edit anywhere in the history (not
+        just the last round) rebuilds the board from that round on.
+        """
+        rows = [self._row(round_data) for round_data in scores_by_round]
+        same = 0
+        while same < min(len(rows), self.rounds_played) and rows[same] == self.rows[same]:
+            same += 1
+        self.truncate(same)
+        for row in rows[same:]:
+            self._append_row(row)
+        return self
+
+    def _row(self, round_data):
+        return tuple((round_data[p]["guess"], round_data[p]["score"]) for p in self.players)
+
+    def to_frame(self):
+        import pandas as pd
+
+        labels = [f"{ROUNDS[i]} {trump_for_round(i)}" for i in range(self.rounds_played)]
+        data = [[v for pair in row for v in pair] for row in self.rows]
+        totals = self.running[-1] if self.running else (0,) * len(self.players)
+        data.append([v for t in totals for v in (None, t)])
+
+        columns = pd.MultiIndex.from_product([self.players, ["Guess", "Score"]])
+        return pd.DataFrame(data, index=labels + ["Total"], columns=columns).astype("Int64")
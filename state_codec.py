@@ -0,0 +1,217 @@
+"""Compact, versioned encoding of the game state kept in the whist_state cookie.
+
+Layout (version 1), base64url encoded behind a "W" prefix:
+
+    version u8 | flags u8 | round_num u8
+    [game_start_time: u64 ms since epoch, or u8 length + utf-8 text]
+    players u8, then each name as u8 length + utf-8
+    rounds u8, then rounds x players guesses, then rounds x players tricks
+    [current guesses, one byte per player]
+
+Scores are not stored; they are recomputed from guesses and tricks.
+Legacy cookies (zlib + base64 JSON, possibly URL-quoted) still decode.
+
+When the game lives in the server-side store the cookie only holds a
+reference: "G" followed by the game_id.
+"""
+import base64
+import json
+import struct
+import urllib.parse
+import zlib
+from datetime import datetime, timedelta
+
+from engine import round_score, tricks_from_score
+
+VERSION = 1
+PREFIX = "W"
+REF_PREFIX = "G"
+TOKEN_SEP = "#"
+CLEARED = "-"  # written instead of deleting the cookie, so the write can be acknowledged
+MISSING = 0xFF
+
+FLAG_STARTED = 1
+FLAG_AWAITING = 2
+FLAG_OVER = 4
+FLAG_GUESSES = 8
+FLAG_TIME = 16
+FLAG_TIME_TEXT = 32
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class StateDecodeError(ValueError):
+    pass
+
+
+def _time_to_ms(value):
+    try:
+        ms = round((datetime.fromisoformat(value) - _EPOCH) / timedelta(milliseconds=1))
+    except (TypeError, ValueError):
+        return None
+    if ms < 0 or _ms_to_time(ms) != value:
+        return None
+    return ms
+
+
+def _ms_to_time(ms):
+    return (_EPOCH + timedelta(milliseconds=ms)).isoformat(timespec="milliseconds")
+
+
+def _small(value):
+    if value is None:
+        return MISSING
+    value = int(value)
+    if not 0 <= value < MISSING:
+        raise ValueError(f"value out of range for cookie codec: {value}")
+    return value
+
+
+def _pack_text(text):
+    data = text.encode("utf-8")
+    return struct.pack(">B", len(data)) + data
+
+
+def encode_state(state):
+    players = list(state.get("player_order") or [])
+    rounds = state.get("scores_by_round") or []
+    guesses = state.get("guesses") or {}
+    start_time = state.get("game_start_time")
+
+    flags = 0
+    flags |= FLAG_STARTED if state.get("game_started") else 0
+    flags |= FLAG_AWAITING if state.get("awaiting_results") else 0
+    flags |= FLAG_OVER if state.get("game_over") else 0
+    flags |= FLAG_GUESSES if guesses else 0
+
+    out = bytearray(struct.pack(">BB", VERSION, 0))
+    out.append(_small(state.get("round_num")))
+
+    if start_time:
+        ms = _time_to_ms(start_time)
+        if ms is not None:
+            flags |= FLAG_TIME
+            out += struct.pack(">Q", ms)
+        else:
+            flags |= FLAG_TIME_TEXT
+            out += _pack_text(str(start_time))
+
+    out.append(len(players))
+    for name in players:
+        out += _pack_text(name)
+
+    out.append(len(rounds))
+    for r in rounds:
+        out += bytes(_small(r[p]["guess"]) for p in players)
+    for r in rounds:
+        out += bytes(_small(tricks_from_score(r[p]["score"])) for p in players)
+
+    if guesses:
+        out += bytes(_small(guesses.get(p)) for p in players)
+
+    out[1] = flags
+    return PREFIX + base64.urlsafe_b64encode(bytes(out)).decode("ascii").rstrip("=")
+
+
+def _decode_binary(text):
+    data = base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+    pos = 0
+
+    def take(n):
+        nonlocal pos
+        if pos + n > len(data):
+            raise StateDecodeError("truncated state cookie")
+        chunk = data[pos:pos + n]
+        pos += n
+        return chunk
+
+    def take_text():
+        return take(take(1)[0]).decode("utf-8")
+
+    version, flags, round_num = take(3)
+    if version != VERSION:
+        raise StateDecodeError(f"unsupported state cookie version {version}")
+
+    start_time = None
+    if flags & FLAG_TIME:
+        start_time = _ms_to_time(struct.unpack(">Q", take(8))[0])
+    elif flags & FLAG_TIME_TEXT:
+        start_time = take_text()
+
+    players = [take_text() for _ in range(take(1)[0])]
+    n = len(players)
+    num_rounds = take(1)[0]
+    guess_rows = take(num_rounds * n)
+    trick_rows = take(num_rounds * n)
+
+    scores = {p: 0 for p in players}
+    scores_by_round = []
+    for i in range(num_rounds):
+        round_data = {}
+        for j, p in enumerate(players):
+            guess, tricks = guess_rows[i * n + j], trick_rows[i * n + j]
+            score = round_score(guess, tricks)
+            scores[p] += score
+            round_data[p] = {"guess": guess, "score": score}
+        scores_by_round.append(round_data)
+
+    guesses = {}
+    if flags & FLAG_GUESSES:
+        guesses = {p: g for p, g in zip(players, take(n)) if g != MISSING}
+
+    return {
+        "game_started": bool(flags & FLAG_STARTED),
+        "game_start_time": start_time,
+        "round_num": None if round_num == MISSING else round_num,
+        "player_order": players,
+        "scores": scores,
+        "scores_by_round": scores_by_round,
+        "guesses": guesses,
+        "awaiting_results": bool(flags & FLAG_AWAITING),
+        "game_over": bool(flags & FLAG_OVER),
+    }
+
+
+def _decode_legacy(raw):
+    if "%" in raw:
+        raw = urllib.parse.unquote(raw)
+    try:
+        txt = zlib.decompress(base64.b64decode(raw)).decode("utf-8")
+    except Exception:
+        txt = raw
+    return json.loads(txt)
+
+
+def game_ref(game_id, token=None):
+    """Cookie value naming a stored game, with the join token that lets it in."""
+    return REF_PREFIX + game_id + (TOKEN_SEP + token if token else "")
+
+
+def parse_game_ref(raw):
+    """The game_id a cookie refers to, or None if it isn't a reference."""
+    if isinstance(raw, str) and raw.startswith(REF_PREFIX) and len(raw) > len(REF_PREFIX):
+        return raw[len(REF_PREFIX):].partition(TOKEN_SEP)[0]
+    return None
+
+
+def game_ref_token(raw):
+    """The join token in a game reference (None for older references without one)."""
+    if parse_game_ref(raw) is None:
+        return None
+    return raw.partition(TOKEN_SEP)[2] or None
+
+
+def decode_state(raw):
+    """Return the saved state dict, or None if the cookie holds no game."""
+    if raw is None or raw == CLEARED or raw == "":
+        return None
+    if isinstance(raw, dict):
+        return raw
+    try:
+        if raw.startswith(PREFIX):
+            return _decode_binary(raw[len(PREFIX):])
+        return _decode_legacy(raw)
+    except StateDecodeError:
+        raise
+    except Exception as e:
+        raise StateDecodeError(f"could not decode state cookie: {e}") from e
@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app's modules live at the top of the repo, not in a package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Everything the app keeps on disk goes to a scratch directory, never the real .whist
+WORK_DIR = tempfile.mkdtemp(prefix="whist-tests-")
+for name, path in {
+    "WHIST_GAME_DIR": "games",
+    "WHIST_OUTBOX_DB": "outbox.sqlite3",
+    "WHIST_ARCHIVE_DIR": "archive",
+    "WHIST_COMMENTARY_CACHE": "commentary",
+    "WHIST_AUDIO_CACHE": "audio",
+    "WHIST_ADVISOR_CACHE": "advisor",
+    "WHIST_TRACE_FILE": "trace.jsonl",
+}.items():
+    os.environ[name] = os.path.join(WORK_DIR, path)
+
+
+@pytest.fixture(scope="session")
+def stand_ins():
+    """Local viewer and whist-saver stand-ins, with the outbox pointed at them."""
+    import fake_servers
+    import outbox
+
+    servers = {name: fake_servers.serve(name) for name in ("viewer", "saver")}
+    urls = {name: f"http://127.0.0.1:{s.server_port}" for name, s in servers.items()}
+    outbox.VIEWER_URL, outbox.SAVER_URL = urls["viewer"], urls["saver"]
+    yield servers
+    for server in servers.values():
+        server.shutdown()
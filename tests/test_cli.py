@@ -0,0 +1,76 @@
+import io
+import json
+import os
+
+import pytest
+
+import cli
+from state_codec import decode_state
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLAYERS = ["Campbell", "Russell", "Nathan", "Dave"]
+
+
+def new_game(**game):
+    return dict({"players": PLAYERS, "game_id": "g1"}, **game)
+
+
+def test_rounds_are_scored():
+    result = cli.run_game(new_game(rounds=[[[2, 1, 3, 0], [2, 1, 3, 1]]]))
+    assert result["ok"]
+    assert result["round_num"] == 1
+    assert result["totals"] == {"Campbell": 12, "Russell": 11, "Nathan": 13, "Dave": 1}
+    assert decode_state(result["state"])["round_num"] == 1
+
+
+@pytest.mark.parametrize("game, error", [
+    (new_game(events=[{"guesses": [3, 2, 1, 1]}]), "Campbell's guess can't be 3"),
+    (new_game(rounds=[[[0, 0, 0, 0], [1, 1, 1, 1]]]), "Total tricks must equal 7"),
+    (new_game(events=[{"tricks": [7, 0, 0, 0]}]), "guesses must be submitted before results"),
+    (new_game(events=[{"guesses": {"Ian": 1}}]), "unknown player(s) in guesses: Ian"),
+    (new_game(events=[{"guesses": [1, 2]}]), "guesses needs 4 values, got 2"),
+    (new_game(events=[{"guesses": [0, 0, 0, 0], "round": 2}]), "event is for round 2"),
+    (new_game(events=[{"shuffle": True}]), "unknown event"),
+    (new_game(events=[{"redo": True}]), "nothing to redo"),
+    ({"players": ["A", "A"]}, "player names must be different"),
+    ({"state": "Wnot-a-state"}, "unsupported state cookie version"),
+    ({}, "a game needs a state or players"),
+    ([1, 2], "a game must be a JSON object"),
+])
+def test_errors_become_result_lines(game, error):
+    result = cli.run_game(game)
+    assert result["ok"] is False
+    assert error in result["error"]
+    assert result["game_id"] == (game.get("game_id") if isinstance(game, dict) else None)
+
+
+def test_read_games_reports_bad_lines_and_lists():
+    games = list(cli.read_games(io.StringIO('{"players": ["A", "B"]}\nnot json\n\n[1]\n')))
+    assert games[0] == {"players": ["A", "B"]}
+    assert isinstance(games[1], cli.InputError) and str(games[1]).startswith("line 2:")
+    assert games[2] == [1]
+
+    (broken,) = cli.read_games(io.StringIO('[{"players": ["A", "B"]},'))
+    assert isinstance(broken, cli.InputError) and "invalid JSON list" in str(broken)
+
+
+def test_import_writes_a_line_per_game(tmp_path, capsys):
+    path = tmp_path / "games.jsonl"
+    path.write_text(json.dumps(new_game()) + "\n" + json.dumps({"players": ["A", "A"]}) + "\n{oops\n")
+    assert cli.main(["import", str(path)]) == 1
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["ok"] for line in lines] == [True, False, False]
+
+
+def test_import_of_a_malformed_list_is_a_result_line(tmp_path, capsys):
+    path = tmp_path / "games.json"
+    path.write_text('[{"players": ["A", "B"]},')
+    assert cli.main(["import", str(path)]) == 1
+    (line,) = capsys.readouterr().out.splitlines()
+    assert json.loads(line)["ok"] is False
+
+
+def test_docstring_apply_example_runs(capsys):
+    state_file = os.path.join(ROOT, "cookie-value-round12")
+    assert cli.main(["apply", "--state-file", state_file, "--guesses", "2,1,3,0", "--tricks", "2,1,3,1"]) == 0
+    assert json.loads(capsys.readouterr().out)["game_over"]
@@ -0,0 +1,52 @@
+import numpy as np
+
+from engine import ROUNDS, score_batch
+
+
+def unplayed(games=1, players=4):
+    return np.full((games, len(ROUNDS), players), -1), np.full((games, len(ROUNDS), players), -1)
+
+
+def test_scores_hits_and_misses():
+    guesses, tricks = unplayed()
+    guesses[0, 0] = [3, 2, 1, 0]
+    tricks[0, 0] = [3, 1, 3, 0]
+    result = score_batch(guesses, tricks)
+    assert result.scores[0, 0].tolist() == [13, 1, 3, 10]
+    assert result.scores[0, 1:].sum() == 0
+    assert result.rounds_played.tolist() == [1]
+
+
+def test_hook_only_flags_bids_adding_up_to_the_cards():
+    guesses, tricks = unplayed(players=3)
+    guesses[0, 0], tricks[0, 0] = [3, 2, 2], [3, 2, 2]   # 7 bid on 7 cards
+    guesses[0, 1], tricks[0, 1] = [3, 2, 2], [3, 2, 1]   # 7 bid on 6 cards
+    guesses[0, 2], tricks[0, 2] = [4, 0, 0], [5, 0, 0]   # 4 bid on 5 cards
+    result = score_batch(guesses, tricks)
+    assert result.hook_violations[0, :3].tolist() == [True, False, False]
+    assert result.trick_violations[0, :3].tolist() == [False, False, False]
+    assert not result.hook_violations[0, 3:].any()
+
+
+def test_half_played_round_is_not_checked():
+    guesses, tricks = unplayed(players=3)
+    guesses[0, 0] = [3, 2, 2]
+    result = score_batch(guesses, tricks)
+    assert not result.hook_violations.any()
+    assert not result.trick_violations.any()
+    assert result.rounds_played.tolist() == [0]
+
+
+def test_trick_violations():
+    guesses, tricks = unplayed(players=2)
+    guesses[0, 0], tricks[0, 0] = [1, 1], [3, 3]
+    assert score_batch(guesses, tricks).trick_violations[0, 0]
+
+
+def test_ranks_share_places_on_ties():
+    guesses, tricks = unplayed(games=2, players=4)
+    guesses[0, 0], tricks[0, 0] = [2, 2, 0, 1], [2, 2, 3, 0]   # 12, 12, 3, 0
+    guesses[1, 0], tricks[1, 0] = [0, 0, 0, 1], [1, 2, 3, 1]   # 1, 2, 3, 11
+    result = score_batch(guesses, tricks)
+    assert result.totals.tolist() == [[12, 12, 3, 0], [1, 2, 3, 11]]
+    assert result.ranks.tolist() == [[1, 1, 3, 4], [4, 3, 2, 1]]
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from engine import ROUNDS, bidding_order, cards_in_round, hook_value, round_score
+from game_log import GameLog
+
+PLAYERS = ["Campbell", "Russell", "Nathan", "Dave"]
+
+
+def view(log):
+    return log.to_state(), log.running, log.pending, log.redo_stack
+
+
+def random_guesses(rng, log):
+    cards = cards_in_round(log.round_num)
+    order = bidding_order(log.player_order, log.round_num)
+    guesses = {p: rng.randint(0, cards) for p in order}
+    if guesses[order[-1]] == hook_value(cards, [guesses[p] for p in order[:-1]]):
+        guesses[order[-1]] = (guesses[order[-1]] + 1) % (cards + 1)
+    return guesses
+
+
+def random_tricks(rng, log):
+    tricks = dict.fromkeys(log.player_order, 0)
+    for _ in range(cards_in_round(log.round_num)):
+        tricks[rng.choice(log.player_order)] += 1
+    return tricks
+
+
+def random_step(rng, log):
+    roll = rng.random()
+    if roll < 0.15 and log.round_num:
+        log.rewind(rng.randint(0, log.round_num))
+    elif roll < 0.3 and log.can_redo:
+        log.redo()
+    elif log.awaiting_results:
+        log.submit_results(random_tricks(rng, log))
+    elif not log.game_over:
+        log.submit_guesses(random_guesses(rng, log))
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_random_rewinds_and_redos_match_replay(seed):
+    rng = random.Random(seed)
+    log = GameLog("2025-04-22T15:53:29.361", PLAYERS[:rng.randint(2, 4)])
+    for _ in range(120):
+        random_step(rng, log)
+        assert view(GameLog.replay(log.game_id, log.player_order, log.events)) == view(log)
+        assert view(GameLog.from_record(log.to_record())) == view(log)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_running_totals_follow_the_rounds(seed):
+    rng = random.Random(seed)
+    log = GameLog("g", PLAYERS)
+    while not log.game_over:
+        random_step(rng, log)
+        totals = dict.fromkeys(PLAYERS, 0)
+        for guesses, tricks in log.rounds:
+            for p, g, t in zip(PLAYERS, guesses, tricks):
+                totals[p] += round_score(g, t)
+        assert log.totals == totals
+    assert log.round_num == len(ROUNDS)
+
+
+def test_rewind_then_redo_restores_the_game():
+    rng = random.Random(1)
+    log = GameLog("g", PLAYERS)
+    for _ in range(5):
+        log.submit_guesses(random_guesses(rng, log))
+        log.submit_results(random_tricks(rng, log))
+    log.submit_guesses(random_guesses(rng, log))
+    before = view(log)
+    log.rewind(2)
+    assert log.round_num == 2 and not log.awaiting_results
+    for _ in range(4):
+        log.redo()
+    assert view(log) == before
+    assert not log.can_redo
+
+
+def test_new_guesses_clear_the_redo_stack():
+    rng = random.Random(2)
+    log = GameLog("g", PLAYERS)
+    log.submit_guesses(random_guesses(rng, log))
+    log.submit_results(random_tricks(rng, log))
+    log.rewind(0)
+    assert log.can_redo
+    log.submit_guesses(random_guesses(rng, log))
+    assert not log.can_redo
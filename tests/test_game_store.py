@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+from game_log import GameLog
+from game_store import GameStore, VersionConflict
+
+PLAYERS = ["Campbell", "Russell", "Nathan", "Dave"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return GameStore(str(tmp_path))
+
+
+def new_game(game_id="g1"):
+    return GameLog(game_id, PLAYERS)
+
+
+def test_saved_games_get_a_token(store):
+    store.put("g1", new_game())
+    token = store.join_token("g1")
+    assert token and len(token) >= 16
+    assert store.join_token("g1") == token
+    assert GameStore(store.directory).join_token("g1") == token
+
+
+def test_can_join_needs_the_token(store):
+    store.put("g1", new_game())
+    token = store.join_token("g1")
+    assert store.can_join("g1", token)
+    assert not store.can_join("g1", None)
+    assert not store.can_join("g1", "")
+    assert not store.can_join("g1", token[:-1] + ("A" if token[-1] != "A" else "B"))
+    assert not store.can_join("g2", token)
+
+
+def test_games_from_before_tokens_open_without_one_until_they_get_one(store):
+    store.put("g1", new_game())
+    (path,) = [os.path.join(store.directory, f) for f in os.listdir(store.directory)]
+    with open(path) as f:
+        saved = json.load(f)
+    del saved["join"]
+    with open(path, "w") as f:
+        json.dump(saved, f)
+
+    old = GameStore(store.directory)
+    assert old.can_join("g1", None)
+    assert not old.can_join("g1", "guess")
+    token = old.join_token("g1")
+    assert not old.can_join("g1", None)
+    assert old.can_join("g1", token)
+
+
+def test_unknown_game_has_no_token(store):
+    assert store.join_token("nope") is None
+    assert not store.can_join("nope", None)
+
+
+def test_put_rejects_a_save_from_an_older_version(store):
+    version = store.put("g1", new_game())
+    phone, _ = store.get("g1")
+    tablet, _ = store.get("g1")
+    phone.submit_guesses({"Campbell": 0, "Russell": 0, "Nathan": 0, "Dave": 0})
+    assert store.put("g1", phone, version) == version + 1
+
+    tablet.submit_guesses({"Campbell": 1, "Russell": 1, "Nathan": 1, "Dave": 0})
+    with pytest.raises(VersionConflict):
+        store.put("g1", tablet, version)
+    saved, _ = store.get("g1")
+    assert saved.pending == (0, 0, 0, 0)
+
+
+def test_put_of_an_unchanged_log_is_not_a_conflict(store):
+    version = store.put("g1", new_game())
+    assert store.put("g1", new_game(), None) == version
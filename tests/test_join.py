@@ -0,0 +1,65 @@
+"""Who may write to a hosted game, driven through main.py with AppTest."""
+import pytest
+
+from bench.apptest_utils import button, install_fake_cookies, new_app, use_own_cookie_jar
+from engine import PLAYERS
+from game_store import get_store
+from state_codec import encode_state, game_ref_token, parse_game_ref
+
+pytestmark = pytest.mark.usefixtures("stand_ins")
+
+
+@pytest.fixture(autouse=True)
+def fake_cookies():
+    install_fake_cookies()
+
+
+def session(cookie=None):
+    at = new_app()
+    jar = use_own_cookie_jar(at, {"_ready": "1", **({"whist_state": cookie} if cookie else {})})
+    at.run()
+    return at, jar
+
+
+def submit_guesses(at):
+    for widget in at.number_input:
+        widget.set_value(0)
+    at.run()
+    button(at, "Submit Guesses").click().run()
+    assert not at.exception
+
+
+def hosted_game():
+    at, jar = session()
+    button(at, "Start Game").click().run()
+    submit_guesses(at)
+    return at.session_state["game_start_time"], jar
+
+
+def test_full_state_cookie_cant_take_over_a_hosted_game():
+    game_id, owner_jar = hosted_game()
+    token = game_ref_token(owner_jar["whist_state"])
+    version = get_store().version(game_id)
+
+    forged = encode_state({
+        "game_started": True, "game_start_time": game_id, "round_num": 0, "player_order": PLAYERS,
+        "scores": dict.fromkeys(PLAYERS, 0), "scores_by_round": [], "guesses": {},
+        "awaiting_results": False, "game_over": False,
+    })
+    at, jar = session(forged)
+    submit_guesses(at)
+
+    assert at.session_state["game_start_time"] != game_id
+    assert parse_game_ref(jar["whist_state"]) != game_id
+    assert token not in jar["whist_state"]
+    assert get_store().version(game_id) == version
+
+
+def test_reference_needs_the_join_token():
+    game_id, owner_jar = hosted_game()
+    at, _ = session("G" + game_id)
+    assert at.session_state["game_start_time"] != game_id
+
+    at, _ = session(owner_jar["whist_state"])
+    assert at.session_state["game_start_time"] == game_id
+    assert at.session_state["awaiting_results"]
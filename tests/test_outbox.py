@@ -0,0 +1,174 @@
+"""Outbox delivery against the local stand-ins in fake_servers.py."""
+import time
+
+import pytest
+
+import fake_servers
+import outbox
+from outbox import DONE, FAILED, Outbox, sheet_results
+
+
+@pytest.fixture
+def box(tmp_path, monkeypatch):
+    monkeypatch.setattr(outbox, "BACKOFF_BASE", 0.01)
+    box = Outbox(str(tmp_path / "outbox.sqlite3"))
+    yield box
+    box.close()
+
+
+@pytest.fixture
+def viewer():
+    server = fake_servers.serve("viewer")
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def saver(monkeypatch):
+    server = fake_servers.serve("saver")
+    monkeypatch.setattr(outbox, "SAVER_URL", url(server))
+    yield server
+    server.shutdown()
+
+
+def url(server, path="/"):
+    return f"http://127.0.0.1:{server.server_port}{path}"
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def body_of(box, job_id):
+    return box._query("SELECT body FROM jobs WHERE id = ?", (job_id,))[0][0]
+
+
+def test_retries_a_failing_service_until_it_answers(box, viewer):
+    viewer.RequestHandlerClass.failure_rate = 1.0
+    job_id = box.enqueue("g1", url(viewer, "/?game_id=g1"), {"round_num": 0})
+    wait_for(lambda: box.job(job_id)["attempts"] >= 2)
+    assert box.job(job_id)["status"] == "pending"
+    assert box.job(job_id)["error"] == "HTTP 503"
+
+    viewer.RequestHandlerClass.failure_rate = 0.0
+    assert box.wait_idle()
+    job = box.job(job_id)
+    assert job["status"] == DONE and job["code"] == 200
+    assert body_of(box, job_id) is None
+
+
+def test_gives_up_after_max_attempts_and_drops_the_body(box, viewer, monkeypatch):
+    monkeypatch.setattr(outbox, "MAX_ATTEMPTS", 3)
+    viewer.RequestHandlerClass.failure_rate = 1.0
+    job_id = box.enqueue("g1", url(viewer), {"password": "secret"})
+    assert box.wait_idle()
+    job = box.job(job_id)
+    assert job["status"] == FAILED and job["attempts"] == 3
+    assert body_of(box, job_id) is None
+
+
+def test_connection_errors_back_off_too(box, viewer):
+    dead = url(viewer)
+    viewer.shutdown()
+    viewer.server_close()
+    job_id = box.enqueue("g1", dead, {})
+    wait_for(lambda: box.job(job_id)["attempts"] >= 2)
+    job = box.job(job_id)
+    assert job["status"] == "pending" and "ConnectionError" in job["error"]
+
+
+def test_a_handler_that_raises_counts_as_an_attempt(box, viewer, monkeypatch):
+    monkeypatch.setattr(outbox, "MAX_ATTEMPTS", 2)
+    box._handlers["post"] = lambda url, body: 1 / 0
+    job_id = box.enqueue("g1", url(viewer), {"password": "secret"})
+    assert box.wait_idle()
+    job = box.job(job_id)
+    assert job["status"] == FAILED and job["attempts"] == 2
+    assert "ZeroDivisionError" in job["error"]
+    assert body_of(box, job_id) is None
+
+
+def test_jobs_for_one_game_go_in_order(box, viewer):
+    for seq in range(1, 6):
+        box.enqueue("g1", url(viewer, "/?game_id=g1"), {"seq": seq, "type": "full", "round_num": 0,
+                                                      "dealer": "Dave", "scores_by_round": [], "guesses": {}})
+    assert box.wait_idle()
+    assert [post["seq"] for post in viewer.RequestHandlerClass.games["g1"]] == [1, 2, 3, 4, 5]
+
+
+# -- the sheet ---------------------------------------------------------------
+
+class Reply:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        if isinstance(self.data, Exception):
+            raise self.data
+        return self.data
+
+
+def test_sheet_results_only_settles_listed_games():
+    games = {"g1", "g2", "g3"}
+    assert sheet_results(Reply({"accepted": ["g1", "other"], "rejected": {"g2": "bad", "x": "?"}}), games) == (
+        ["g1"], {"g2": "bad"})
+    assert sheet_results(Reply({"accepted": [], "rejected": ["g3"]}), games) == ([], {"g3": "rejected"})
+
+
+@pytest.mark.parametrize("data", [ValueError("not JSON"), "OK", [], {"ok": True},
+                                  {"accepted": "g1"}, {"rejected": "g1"}])
+def test_sheet_results_none_for_answers_that_arent_batch_results(data):
+    assert sheet_results(Reply(data), {"g1"}) is None
+
+
+def scores(*points):
+    return [{"Player": p, "Score": s} for p, s in zip(["Campbell", "Russell", "Nathan", "Dave"], points)]
+
+
+def test_batch_settles_what_the_saver_accepts(box, saver):
+    box.queue_scores("g1", scores(10, 20, 30, 40))
+    box.queue_scores("g2", [])
+    job_id = box.submit_sheet("pw", "sheet")
+    assert box.wait_idle()
+    assert box.job(job_id)["status"] == DONE
+    assert box.sheet_games(job_id) == [("g1", 1, None), ("g2", 0, "no scores")]
+    assert box.sheet_status() == {"unsent": 1, "sending": 0, "accepted": 1}
+    assert body_of(box, job_id) is None
+
+    # Only the game that wasn't accepted goes in the next batch
+    box._exec("UPDATE sheet_games SET scores = ? WHERE game_id = 'g2'", ('[{"Player": "Dave", "Score": 1}]',))
+    again = box.submit_sheet("pw", "sheet")
+    assert box.wait_idle()
+    assert box.sheet_games(again) == [("g2", 1, None)]
+    assert box.submit_sheet("pw", "sheet") is None
+
+
+def test_games_missing_from_the_answer_stay_unsent(box, saver):
+    saver.RequestHandlerClass.omit = {"g2"}
+    box.queue_scores("g1", scores(1, 2, 3, 4))
+    box.queue_scores("g2", scores(5, 6, 7, 8))
+    job_id = box.submit_sheet("pw", "sheet")
+    assert box.wait_idle()
+    assert box.sheet_games(job_id) == [("g1", 1, None), ("g2", 0, None)]
+    assert box.sheet_status()["unsent"] == 1
+
+
+def test_older_saver_gets_one_request_per_game(box, monkeypatch):
+    server = fake_servers.serve("saver", legacy=True)
+    monkeypatch.setattr(outbox, "SAVER_URL", url(server))
+    server.RequestHandlerClass.seen.add("g2")  # already recorded: answered 207
+    try:
+        box.queue_scores("g1", scores(1, 2, 3, 4))
+        box.queue_scores("g2", scores(5, 6, 7, 8))
+        job_id = box.submit_sheet("pw", "sheet")
+        assert box.wait_idle()
+        assert box._sheet_legacy
+        (g1, g2) = box.sheet_games(job_id)
+        assert g1 == ("g1", 1, None)
+        assert g2[:2] == ("g2", 1) and "already recorded" in g2[2]
+        assert box.sheet_status() == {"unsent": 0, "sending": 0, "accepted": 2}
+    finally:
+        server.shutdown()
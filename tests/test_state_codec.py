@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from state_codec import decode_state, encode_state, game_ref, game_ref_token, parse_game_ref
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES = ["cookie-value-complete", "cookie-value-last-round", "cookie-value-round12"]
+
+
+def read_sample(name):
+    with open(os.path.join(ROOT, name), encoding="utf-8") as f:
+        return f.read().strip()
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_sample_round_trips(name):
+    state = decode_state(read_sample(name))
+    blob = encode_state(state)
+    again = decode_state(blob)
+    for key in set(state) | set(again):
+        assert again.get(key) == state.get(key), key
+    assert encode_state(again) == blob
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_sample_totals_match_rounds(name):
+    state = decode_state(read_sample(name))
+    assert state["round_num"] == len(state["scores_by_round"])
+    for p in state["player_order"]:
+        assert state["scores"][p] == sum(r[p]["score"] for r in state["scores_by_round"])
+
+
+
+def test_game_ref_carries_token():
+    raw = game_ref("2025-04-22T15:53:29.361", "abc_-123")
+    assert parse_game_ref(raw) == "2025-04-22T15:53:29.361"
+    assert game_ref_token(raw) == "abc_-123"
+    assert game_ref_token(game_ref("2025-04-22T15:53:29.361")) is None
+    assert parse_game_ref(read_sample("cookie-value-round12")) is None
@@ -0,0 +1,173 @@
+"""Span timings for the script's phases and every outbound call.
+
+Off unless WHIST_TRACE is set; until then span() hands back a shared
+no-op and nothing else happens. When on, each rerun is a Run holding
+the spans timed inside it; finished runs are appended as one JSON line
+to a rotating trace file (WHIST_TRACE_FILE). Spans timed outside a run,
+such as outbox deliveries on their worker threads, get a line each.
+
+    run = tracing.begin("rerun")
+    tracing.phase("restore")         # top-level phases need no indentation
+    with tracing.span("outbox.post"):
+        ...
+    tracing.end(run)
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+ENABLED = os.environ.get("WHIST_TRACE", "") not in ("", "0")
+TRACE_FILE = os.environ.get("WHIST_TRACE_FILE", os.path.join(".whist", "trace.jsonl"))
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 3
+
+_current = contextvars.ContextVar("whist_trace_run", default=None)
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def _write(record):
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                if os.path.dirname(TRACE_FILE):
+                    os.makedirs(os.path.dirname(TRACE_FILE), exist_ok=True)
+                handler = RotatingFileHandler(TRACE_FILE, maxBytes=MAX_BYTES, backupCount=BACKUPS, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger = logging.getLogger("whist.trace")
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                logger.addHandler(handler)
+                _logger = logger
+    _logger.info(json.dumps(record, separators=(",", ":"), default=str))
+
+
+class Run:
+    def __init__(self, label, **attrs):
+        self.label = label
+        self.attrs = attrs
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.spans = []  # (name, offset ms, duration ms, attrs)
+        self.total_ms = None
+        self.status = None
+        self._phase = None  # (name, start) of the phase in progress
+
+    def add(self, name, start, duration, attrs):
+        self.spans.append((name, (start - self._t0) * 1000, duration * 1000, attrs))
+
+    def phase(self, name):
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.add(self._phase[0], self._phase[1], now - self._phase[1], {})
+        self._phase = (name, now) if name else None
+
+    def finish(self, status="ok"):
+        if self.total_ms is not None:
+            return
+        # An interrupted run (st.stop, st.rerun) ends where its last span did;
+        # when its open phase stopped isn't known, so that phase is dropped
+        if status == "ok":
+            self.phase(None)
+            self.total_ms = (time.perf_counter() - self._t0) * 1000
+        else:
+            self.total_ms = max((offset + duration for _, offset, duration, _ in self.spans), default=0.0)
+        self.status = status
+        _write(self.to_record())
+
+    def phase_ms(self):
+        """Total time per span name."""
+        phases = {}
+        for name, _, duration, _ in self.spans:
+            phases[name] = phases.get(name, 0.0) + duration
+        return phases
+
+    def to_record(self):
+        return {
+            "run": self.label,
+            "ts": self.started,
+            "status": self.status,
+            "ms": round(self.total_ms, 2),
+            **self.attrs,
+            "spans": [
+                {"name": name, "at": round(offset, 2), "ms": round(duration, 2), **attrs}
+                for name, offset, duration, attrs in self.spans
+            ],
+        }
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "start", "run")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.run = _current.get()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        # st.rerun() and st.stop() raise BaseExceptions; those aren't failures
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.attrs["error"] = exc_type.__name__
+        if self.run is not None and self.run.total_ms is None:
+            self.run.add(self.name, self.start, duration, self.attrs)
+        else:
+            _write({"span": self.name, "ts": time.time() - duration, "ms": round(duration * 1000, 2), **self.attrs})
+        return False
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL = _NullSpan()
+
+
+def span(name, **attrs):
+    """Time a block; the returned span's set() adds attributes once they're known."""
+    if not ENABLED:
+        return _NULL
+    return _Span(name, attrs)
+
+
+def begin(label, **attrs):
+    """Start a run on this thread (None when tracing is off)."""
+    if not ENABLED:
+        return None
+    run = Run(label, **attrs)
+    _current.set(run)
+    return run
+
+
+def phase(name):
+    """End the current run's phase in progress (if any) and start the next."""
+    run = _current.get() if ENABLED else None
+    if run is not None and run.total_ms is None:
+        run.phase(name)
+
+
+def end(run, status="ok"):
+    if run is None:
+        return
+    run.finish(status)
+    if _current.get() is run:
+        _current.set(None)
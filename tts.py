@@ -0,0 +1,83 @@
+"""ElevenLabs speech for the match summary, streamed into an on-disk cache."""
+import json
+import os
+
+import requests
+
+import tracing
+from disk_cache import DiskCache, content_key
+
+BASE_URL = os.environ.get("WHIST_ELEVENLABS_URL", "https://api.elevenlabs.io")
+VOICE_ID = "eFsK7V4odsRpqOxGAOc8"
+MODEL_ID = "eleven_multilingual_v2"
+VOICE_SETTINGS = {
+    "stability": 0.73,
+    "similarity_boost": 0.75,
+    "style": 0.06,
+    "use_speaker_boost": True,
+    "speed": 1.07
+}
+CACHE_DIR = os.environ.get("WHIST_AUDIO_CACHE", os.path.join(".whist", "audio"))
+CACHE_BYTES = 50 * 1024 * 1024
+CHUNK_SIZE = 16 * 1024
+TIMEOUT = (3.05, 30)
+
+_cache = None
+_session = requests.Session()
+
+
+class SpeechError(Exception):
+    pass
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(CACHE_DIR, CACHE_BYTES, suffix=".mp3")
+    return _cache
+
+
+def audio_key(text):
+    return content_key(VOICE_ID, MODEL_ID, json.dumps(VOICE_SETTINGS, sort_keys=True), text)
+
+
+def cached_audio(text):
+    """Path of the cached MP3 for this text, or None."""
+    return get_cache().lookup(audio_key(text))
+
+
+def iter_speech(api_key, text):
+    """Yield MP3 chunks as ElevenLabs produces them, writing them through to the cache."""
+    with tracing.span("elevenlabs.tts", chars=len(text)) as span:
+        response = _session.post(
+            f"{BASE_URL}/v1/text-to-speech/{VOICE_ID}/stream",
+            headers={
+                "xi-api-key": api_key,
+                "Accept": "audio/mpeg",
+                "Content-Type": "application/json"
+            },
+            json={"text": text, "model_id": MODEL_ID, "voice_settings": VOICE_SETTINGS},
+            stream=True,
+            timeout=TIMEOUT,
+        )
+        with response:
+            span.set(code=response.status_code)
+            if not response.ok:
+                raise SpeechError(f"ElevenLabs returned HTTP {response.status_code}")
+            received = 0
+            with get_cache().writer(audio_key(text)) as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    received += len(chunk)
+                    yield chunk
+            span.set(bytes=received)
+
+
+def synthesise(api_key, text, on_chunk=None):
+    """Stream speech for text into the cache and return the cached file's path."""
+    received = 0
+    for chunk in iter_speech(api_key, text):
+        received += len(chunk)
+        if on_chunk:
+            on_chunk(received)
+    return cached_audio(text)